@@ -1,26 +1,85 @@
 #include "HX711.h"
 
+// Streams every raw conversion to the host (serial_hx711.py) as an 8-byte
+// binary frame:
+//   0xAA 0x55 seq gain v0 v1 v2 crc
+// seq counts frames (wrapping at 256) so the host can count drops, gain is
+// the HX711 pulse code (1 = A/128, 3 = A/64, 2 = B/32), v0..v2 is the signed
+// 24-bit reading, least significant byte first, and crc is CRC-8 (poly
+// 0x07) over seq..v2. Tare and calibration are done on the host.
+//
+// Commands from the host:
+//   'g' <code>  select gain by pulse code
+//   'd'         power down
+//   'u'         power up
+
 const int DOUT_PIN = 2;
 const int SCK_PIN = 3;
+const long BAUD_RATE = 115200;
 
 HX711 scale;
-float calibration_factor = -2267.1892;  // Your calibration value
+uint8_t seq = 0;
+uint8_t gainCode = 1;
+bool poweredDown = false;
+
+uint8_t crc8(const uint8_t *data, uint8_t len) {
+  uint8_t crc = 0;
+  while (len--) {
+    crc ^= *data++;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void setGain(uint8_t code) {
+  if (code == 1) scale.set_gain(128);
+  else if (code == 3) scale.set_gain(64);
+  else if (code == 2) scale.set_gain(32);
+  else return;
+  gainCode = code;
+}
+
+void handleCommands() {
+  while (Serial.available()) {
+    int command = Serial.read();
+    if (command == 'g') {
+      unsigned long start = millis();
+      while (!Serial.available() && millis() - start < 50) {}
+      if (Serial.available()) setGain(Serial.read());
+    } else if (command == 'd') {
+      scale.power_down();
+      poweredDown = true;
+    } else if (command == 'u') {
+      scale.power_up();
+      poweredDown = false;
+    }
+  }
+}
+
+void sendSample(long value) {
+  uint8_t frame[8];
+  frame[0] = 0xAA;
+  frame[1] = 0x55;
+  frame[2] = seq++;
+  frame[3] = gainCode;
+  frame[4] = value & 0xFF;
+  frame[5] = (value >> 8) & 0xFF;
+  frame[6] = (value >> 16) & 0xFF;
+  frame[7] = crc8(frame + 2, 5);
+  Serial.write(frame, sizeof(frame));
+}
 
 void setup() {
-  Serial.begin(57600);
+  Serial.begin(BAUD_RATE);
   scale.begin(DOUT_PIN, SCK_PIN);
-  scale.set_scale(calibration_factor);
-  scale.tare();  // Reset to zero
-  Serial.println("Scale ready!");
 }
 
 void loop() {
-  if (scale.is_ready()) {
-    float weight = scale.get_units(5);
-    Serial.print("Raw reading: ");
-    Serial.print(scale.get_value());  // Add this to see raw value
-    Serial.print("\tWeight: ");
-    Serial.println(weight, 1);
+  handleCommands();
+  // No averaging or delay: every conversion goes out as soon as it is ready.
+  if (!poweredDown && scale.is_ready()) {
+    sendSample(scale.read());
   }
-  delay(200);
-}
\ No newline at end of file
+}
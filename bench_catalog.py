@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+"""Catalog benchmark: compile time and cart pricing for a large store.
+
+Builds a synthetic catalog of --skus products with weight tiers and
+promotions, then prices carts one item at a time (the old calculate_price
+loop over a dict) and with one Catalog.price_cart() call.
+
+    python bench_catalog.py [--skus 5000] [--cart 50]
+"""
+import argparse
+import logging
+import random
+import time
+
+import logzero
+
+from catalog import Catalog
+
+
+def synthetic_products(count, seed=0):
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        product = {'label': f"sku_{i}", 'base_price': rng.randint(1, 50), 'rate': rng.choice([0, 0.01, 0.02])}
+        if rng.random() < 0.3:
+            product['tiers'] = [{'from_g': 500, 'rate': 0.008}, {'from_g': 1000, 'rate': 0.006}]
+        if rng.random() < 0.1:
+            product['discount'] = 0.15
+        products.append(product)
+    return products
+
+
+def dict_price(products, label, weight):
+    # calculate_price() as it was: a dict lookup and arithmetic per item,
+    # extended with the same tier and discount rules.
+    info = products[label]
+    rate = info['rate']
+    for tier in info.get('tiers', ()):
+        if weight >= tier['from_g']:
+            rate = tier['rate']
+    return (info['base_price'] + weight * rate) * (1 - info.get('discount', 0))
+
+
+def timed(call, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skus', type=int, default=5000)
+    parser.add_argument('--cart', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    logzero.loglevel(logging.WARNING)
+
+    products = synthetic_products(args.skus)
+    start = time.perf_counter()
+    catalog = Catalog(products=products)
+    compile_time = time.perf_counter() - start
+    labels = [p['label'] for p in products]
+    catalog.bind_labels(labels)
+
+    rng = random.Random(1)
+    cart = [rng.randrange(args.skus) for _ in range(args.cart)]
+    cart_labels = [labels[i] for i in cart]
+    weights = [rng.uniform(10, 1500) for _ in cart]
+    by_label = {p['label']: p for p in products}
+
+    loop = timed(lambda: [dict_price(by_label, l, w) for l, w in zip(cart_labels, weights)], args.repeat)
+    vector_labels = timed(lambda: catalog.price_cart(cart_labels, weights), args.repeat)
+    vector_ids = timed(lambda: catalog.price_cart(cart, weights), args.repeat)
+    single = timed(lambda: catalog.price(cart_labels[0], weights[0]), args.repeat)
+
+    print(f"Compiled {args.skus} products in {compile_time * 1e3:.1f} ms")
+    print(f"Cart of {args.cart}:")
+    print(f"  per-item loop        {loop * 1e6:>9.1f} us")
+    print(f"  price_cart(labels)   {vector_labels * 1e6:>9.1f} us")
+    print(f"  price_cart(indices)  {vector_ids * 1e6:>9.1f} us")
+    print(f"Single item price()    {single * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
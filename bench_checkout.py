@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+"""End-to-end checkout benchmark on simulated hardware.
+
+Runs main.main() unchanged against sim.py: a synthetic scale and camera
+following a seeded scenario, the simulated Edge Impulse runner and a local
+stub of the detections API. Reports items per minute, time from an item
+touching the scale to its detection reaching the server, CPU use and
+label accuracy. The same seed gives the same scenario, so runs before and
+after a change are comparable. Exits with status 1 when fewer than
+--min-billed of the items reach the server, so it doubles as a check that
+no decision path loses items.
+
+    python bench_checkout.py [--items 10] [--seed 0] [--scenario file.json]
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import logzero
+
+import sim
+
+sim.install()
+
+import camera as camera_module  # noqa: E402
+import catalog as catalog_module  # noqa: E402
+import main  # noqa: E402  (needs the simulated gpiod and runner)
+from stub_server import StubServer  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return float('nan')
+    index = min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def match(scenario, server):
+    # Pair each delivered detection with the latest item placed before it
+    # arrived; an item is only counted once.
+    matched = []
+    used = set()
+    for key, received_at in sorted(server.received_at.items(), key=lambda kv: kv[1]):
+        t = received_at - scenario.start_time
+        candidates = [i for i, item in enumerate(scenario.items) if item.placed_at <= t and i not in used]
+        if not candidates:
+            matched.append((None, server.received[key], t))
+            continue
+        index = candidates[-1]
+        used.add(index)
+        matched.append((scenario.items[index], server.received[key], t))
+    return matched
+
+
+def write_catalog(path, weights=True):
+    # The repo catalog's prices, with the simulated products' weights as a
+    # store would fill them in for fusion.
+    products = catalog_module.read_products(main.CATALOG_PATH)
+    for product in products:
+        if weights and product['label'] in sim.DEFAULT_PRODUCTS:
+            product['weight_g'], product['weight_std_g'] = sim.DEFAULT_PRODUCTS[product['label']]
+    with open(path, 'w') as f:
+        json.dump(products, f)
+
+
+def run(scenario, verbose=False, settle=15.0, calibration_file=None, model_init=0.0, serial_sps=None,
+        confidence=0.9, confusion=0.0, fusion=None, weights=True):
+    workdir = tempfile.mkdtemp(prefix='bench_checkout-')
+    model_file = os.path.join(workdir, 'model.eim')
+    open(model_file, 'w').close()
+    catalog_path = os.path.join(workdir, 'catalog.json')
+    write_catalog(catalog_path, weights)
+
+    board = None
+    if serial_sps:
+        from fake_arduino import FakeArduino
+        board = FakeArduino(sim.SyntheticScale(scenario), sps=serial_sps).start()
+        main.SCALE_SERIAL_PORT = board.port
+    else:
+        sim.attach_scale(scenario)
+    runner = sim.FakeImageImpulseRunner(model_file, scenario=scenario, init_time=model_init,
+                                        confidence=confidence, confusion=confusion)
+    camera = sim.FakeCameraCapture(scenario)
+
+    with StubServer() as server:
+        main.SERVER_URL = server.url
+        main.OUTBOX_PATH = os.path.join(workdir, 'outbox.db')
+        main.MODEL_FILE = model_file
+        main.CATALOG_PATH = catalog_path
+        main.WEIGHT_STATS_FILE = os.path.join(workdir, 'weight_stats.json')
+        main.FUSION_ENABLED = fusion
+        main.LOG_LEVEL = logging.INFO if verbose else logging.WARNING
+        main.CALIBRATION_FILE = calibration_file or os.path.join(workdir, 'calibration.json')
+        main.METRICS_PORT = None
+        main.ImageImpulseRunner = lambda modelfile: runner
+        camera_module.CameraCapture = lambda *args, **kwargs: camera
+        main.stop_event.clear()
+
+        def target():
+            if verbose:
+                main.main()
+            else:
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    main.main()
+
+        thread = threading.Thread(target=target, name='checkout')
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        thread.start()
+        # main() tares before the first frame; the scenario clock starts once
+        # the camera is in use so taring always sees an empty scale.
+        while camera.delivered == 0 and thread.is_alive():
+            time.sleep(0.01)
+        boot = time.monotonic() - wall_start
+        scenario.start()
+        deadline = time.monotonic() + scenario.duration + settle
+        while time.monotonic() < deadline and thread.is_alive():
+            if scenario.elapsed() > scenario.duration and len(server.received) >= len(scenario.items):
+                break
+            time.sleep(0.05)
+        main.stop_event.set()
+        thread.join(30)
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+        if board is not None:
+            board.stop()
+        return match(scenario, server), boot, wall, cpu, runner.calls, camera.delivered
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenario', help="JSON scenario written by sim.Scenario.save")
+    parser.add_argument('--serial', type=int, metavar='SPS',
+                        help="read the scale through a simulated Arduino at SPS samples/s")
+    parser.add_argument('--calibration', help="calibration file to keep between runs (warm boot)")
+    parser.add_argument('--model-init', type=float, default=2.0, help="seconds the simulated runner.init() takes")
+    parser.add_argument('--confidence', type=float, default=0.9, help="typical score of the simulated detections")
+    parser.add_argument('--confusion', type=float, default=0.0, help="fraction of boxes with a wrong label")
+    parser.add_argument('--fusion', action='store_true', default=None,
+                        help="use vision and weight fusion even without catalog weights")
+    parser.add_argument('--no-fusion', action='store_false', dest='fusion', help="use the confidence-threshold tracker")
+    parser.add_argument('--no-weights', action='store_true', help="leave product weights out of the catalog")
+    parser.add_argument('--min-billed', type=float, default=1.0, metavar='FRACTION',
+                        help="fail unless this fraction of the items is billed")
+    parser.add_argument('--verbose', action='store_true', help="show main.py's output")
+    args = parser.parse_args()
+    if not args.verbose:
+        logzero.loglevel(logging.WARNING)
+
+    if args.scenario:
+        scenario = sim.Scenario.load(args.scenario)
+    else:
+        scenario = sim.Scenario.synthetic(count=args.items, seed=args.seed)
+
+    matched, boot, wall, cpu, inferences, frames = run(scenario, args.verbose, calibration_file=args.calibration, serial_sps=args.serial,
+                                                        model_init=args.model_init, confidence=args.confidence,
+                                                        confusion=args.confusion, fusion=args.fusion,
+                                                        weights=not args.no_weights)
+    delivered = [m for m in matched if m[0] is not None]
+    latencies = [t - item.placed_at for item, _, t in delivered]
+    correct = sum(1 for item, data, _ in delivered if data.get('product') == item.label)
+    weight_errors = [abs(data.get('weight', 0) - item.weight_g) for item, data, _ in delivered]
+
+    print(f"Boot to first frame: {boot:.2f}s")
+    print(f"Scenario: {len(scenario.items)} items over {scenario.duration:.1f}s")
+    print(f"Delivered: {len(delivered)}/{len(scenario.items)} "
+          f"({len(matched) - len(delivered)} unmatched)")
+    print(f"Throughput: {len(delivered) / (scenario.duration / 60.0):.1f} items/min")
+    print(f"Latency placed -> server: p50 {percentile(latencies, 50):.2f}s "
+          f"p95 {percentile(latencies, 95):.2f}s max {max(latencies, default=float('nan')):.2f}s")
+    print(f"Label accuracy: {correct}/{len(delivered)}")
+    if main.fusion is not None:
+        print(f"Fusion: {main.fusion.decided} decided, {main.fusion.low_confidence} low confidence, "
+              f"{main.fusion.undecided} dropped")
+    else:
+        print("Fusion: off (tracker)")
+    print(f"Weight error: mean {sum(weight_errors) / max(1, len(weight_errors)):.1f}g "
+          f"max {max(weight_errors, default=0):.1f}g")
+    print(f"Frames {frames}, inferences {inferences}")
+    print(f"CPU: {cpu:.1f}s over {wall:.1f}s wall ({cpu / wall:.0%})")
+    if len(delivered) < args.min_billed * len(scenario.items):
+        print(f"FAIL: {len(scenario.items) - len(delivered)} of {len(scenario.items)} items not billed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_()
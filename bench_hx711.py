@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+"""Microbenchmark for the HX711 bit-bang decoder on a fake gpiod chip.
+
+Compares the original per-bit readNextBit()/readNextByte() path with the
+specialized reader selected by set_gain()/set_reading_format(), the cost
+of recording every sample with recorder.SampleRecorder, N separate
+HX711 instances with one HX711Array on a shared clock, and reading both
+channels by switching gain versus interleave_channels(). Apart from the
+last two the fake chip answers instantly, so the numbers are decoder
+cost only.
+
+    python bench_hx711.py [--seconds 2]
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+import tempfile
+import time
+
+import fake_gpiod
+fake_gpiod.install()
+
+import logzero
+from hx711 import HX711, HX711Array
+from recorder import SampleRecorder
+
+# Jetson Nano line offsets for pin 38 (J5) and pin 40 (J6).
+DOUT_LINE = 77
+SCK_LINE = 78
+# Pin map for the multi-cell benchmark: DOUT pins 1-8 on lines A0-A7 (0-7),
+# clock pins 11-18 on lines B0-B7 (8-15).
+BENCH_LINE_MAP = {pin: f"A{pin - 1}" for pin in range(1, 9)}
+BENCH_LINE_MAP.update({pin: f"B{pin - 11}" for pin in range(11, 19)})
+
+
+def legacy_read_long(hx):
+    # read_long() as it was before the specialized readers.
+    dataBytes = hx.readRawBytes()
+    logzero.logger.debug(dataBytes)
+    twosComplementValue = (dataBytes[0] << 16) + (dataBytes[1] << 8) + dataBytes[2]
+    logzero.logger.debug(f"Twos: 0x{twosComplementValue:06x}")
+    signedIntValue = hx.convertFromTwosComplement24bit(twosComplementValue)
+    hx.lastVal = signedIntValue
+    return int(signedIntValue)
+
+
+def measure(read, seconds):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            read()
+        count += 100
+    return count / (time.perf_counter() - start)
+
+
+def random_samples():
+    random.seed(0)
+    return itertools.cycle([random.randrange(1 << 24) for _ in range(1000)])
+
+
+def make_scale(byte_format, bit_format):
+    samples = random_samples()
+    fake_gpiod.reset()
+    chip = fake_gpiod.Chip()
+    chip.attach_hx711(fake_gpiod.FakeHX711Device(samples, power_down_after=None), DOUT_LINE, SCK_LINE)
+    hx = HX711(dout=38, pd_sck=40, gain=128, chip=chip)
+    hx.set_reading_format(byte_format, bit_format)
+    return hx
+
+
+def two_channel_scale(sps):
+    fake_gpiod.reset()
+    chip = fake_gpiod.Chip()
+    chip.attach_hx711(fake_gpiod.FakeHX711Device(itertools.repeat(1000), sps=sps, power_down_after=None,
+                                                 samples_b=itertools.repeat(-1000)), DOUT_LINE, SCK_LINE)
+    return HX711(dout=38, pd_sck=40, gain=128, chip=chip)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--sps', type=int, default=80,
+                        help="conversion rate of the fake chip for the channel A/B benchmark")
+    parser.add_argument('--io-delay', type=float, default=5e-6,
+                        help="simulated cost of one GPIO call in seconds (array benchmark)")
+    args = parser.parse_args()
+    logzero.loglevel(logging.INFO)
+
+    print(f"{'format':<10}{'legacy/s':>12}{'fast/s':>12}{'speedup':>10}")
+    for byte_format, bit_format in (('MSB', 'MSB'), ('LSB', 'MSB'), ('MSB', 'LSB')):
+        hx = make_scale(byte_format, bit_format)
+        legacy = measure(lambda: legacy_read_long(hx), args.seconds)
+        hx = make_scale(byte_format, bit_format)
+        fast = measure(hx.read_long, args.seconds)
+        print(f"{byte_format + '/' + bit_format:<10}{legacy:>12.0f}{fast:>12.0f}{fast / legacy:>9.2f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hx = make_scale('MSB', 'MSB')
+        plain = measure(hx.read_long, args.seconds)
+        hx = make_scale('MSB', 'MSB')
+        recorder = hx.add_filter(SampleRecorder(os.path.join(tmp, 'bench.rec'), hx))
+        recorded = measure(hx.read_long, args.seconds)
+        recorder.close()
+    print(f"\n{'recorder':<10}{'off/s':>12}{'on/s':>12}{'ratio':>10}")
+    print(f"{'MSB/MSB':<10}{plain:>12.0f}{recorded:>12.0f}{recorded / plain:>9.2f}x")
+
+    # Sharing the clock only pays off once GPIO calls cost something, so this
+    # part charges each line call --io-delay seconds, like a gpiod ioctl.
+    print(f"\n{'cells':<10}{'separate/s':>12}{'array/s':>12}{'speedup':>10}   (io delay {args.io_delay * 1e6:.0f} us)")
+    for cells in (1, 2, 4, 8):
+        douts = list(range(1, cells + 1))
+        fake_gpiod.reset()
+        chip = fake_gpiod.Chip(io_delay=args.io_delay)
+        scales = []
+        for dout in douts:
+            chip.attach_hx711(fake_gpiod.FakeHX711Device(random_samples(), power_down_after=None), dout - 1, dout + 7)
+            scales.append(HX711(dout=dout, pd_sck=dout + 10, chip=chip,
+                                line_map_name='BENCH', custome_line_map=BENCH_LINE_MAP))
+        separate = measure(lambda: [hx.read_long() for hx in scales], args.seconds)
+        fake_gpiod.reset()
+        chip = fake_gpiod.Chip(io_delay=args.io_delay)
+        for dout in douts:
+            chip.attach_hx711(fake_gpiod.FakeHX711Device(random_samples(), power_down_after=None), dout - 1, 8)
+        # Spin instead of sleeping between ready polls: the fake is always ready.
+        array = HX711Array(douts=douts, pd_sck=11, chip=chip, ready_poll_interval=0,
+                           line_map_name='BENCH', custome_line_map=BENCH_LINE_MAP)
+        shared = measure(array.read_long, args.seconds)
+        print(f"{cells:<10}{separate:>12.0f}{shared:>12.0f}{shared / separate:>9.2f}x")
+
+    # Both channels of one HX711 at a real conversion rate: switching with
+    # set_gain() spends conversions on every switch, interleaving none.
+    print(f"\n{'channels':<12}{'A/s':>10}{'B/s':>10}   ({args.sps} SPS)")
+    hx = two_channel_scale(args.sps)
+    pairs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        hx.read_long()
+        hx.get_value_B(1)
+        pairs += 1
+    pairs /= time.perf_counter() - start
+    print(f"{'set_gain':<12}{pairs:>10.1f}{pairs:>10.1f}")
+    for a, b in ((1, 1), (3, 1)):
+        hx = two_channel_scale(args.sps)
+        hx.interleave_channels(a, b)
+        time.sleep(0.2)
+        start_a, start_b = hx._ring.count, hx._ring_b.count
+        time.sleep(args.seconds)
+        rate_a = (hx._ring.count - start_a) / args.seconds
+        rate_b = (hx._ring_b.count - start_b) / args.seconds
+        hx.stop_sampling()
+        print(f"{f'interleave {a}:{b}':<12}{rate_a:>10.1f}{rate_b:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+"""Multi-lane checkout benchmark on simulated hardware.
+
+Runs N lanes under lanes.LaneSupervisor, each on its own seeded sim.py
+scenario (synthetic scale, camera and runner), all uploading through the
+supervisor's upload process to a local stub of the detections API.
+Reports total items per minute, label accuracy and weight error across
+lanes, and the CPU the lane processes used. --kill-after SECONDS kills
+the first lane once to check that it is restarted and the other lanes
+keep billing.
+
+    python bench_lanes.py [--lanes 2] [--items 10] [--seed 0]
+"""
+import argparse
+import functools
+import logging
+import os
+import resource
+import signal
+import tempfile
+import threading
+import time
+
+import logzero
+
+import sim
+from lanes import Lane, LaneSupervisor
+from stub_server import StubServer
+
+
+def setup_lane(seeds, items, model_init, lane):
+    # Runs in the lane's worker process before main.py is imported.
+    logzero.loglevel(logging.WARNING)
+    sim.install()
+    import camera as camera_module
+    import main
+    scenario = sim.Scenario.synthetic(count=items, seed=seeds[lane.name])
+    sim.attach_scale(scenario)
+    runner = sim.FakeImageImpulseRunner(scenario=scenario, init_time=model_init)
+    camera = sim.FakeCameraCapture(scenario)
+    main.ImageImpulseRunner = lambda modelfile: runner
+    main.LOG_LEVEL = logging.WARNING
+    camera_module.CameraCapture = lambda *args, **kwargs: camera
+
+    def start_scenario():
+        # As in bench_checkout: the clock starts with the first frame, so
+        # taring always sees an empty scale.
+        while camera.delivered == 0:
+            time.sleep(0.01)
+        scenario.start()
+
+    threading.Thread(target=start_scenario, daemon=True).start()
+
+
+def match(scenarios, server):
+    # Lanes are not told apart on the server, so every delivered detection
+    # is paired with the closest-weighing undelivered item of its label.
+    remaining = [item for scenario in scenarios for item in scenario.items]
+    errors = []
+    wrong = 0
+    for data in server.received.values():
+        candidates = [item for item in remaining if item.label == data.get('product')]
+        if not candidates:
+            wrong += 1
+            continue
+        item = min(candidates, key=lambda item: abs(item.weight_g - data.get('weight', 0)))
+        remaining.remove(item)
+        errors.append(abs(item.weight_g - data.get('weight', 0)))
+    return errors, wrong
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lanes', type=int, default=2)
+    parser.add_argument('--items', type=int, default=10, help="items per lane")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model-init', type=float, default=2.0, help="seconds the simulated runner.init() takes")
+    parser.add_argument('--kill-after', type=float, metavar='SECONDS', help="kill the first lane once after SECONDS")
+    parser.add_argument('--settle', type=float, default=15.0)
+    args = parser.parse_args()
+    logzero.loglevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix='bench_lanes-')
+    model_file = os.path.join(workdir, 'model.eim')
+    open(model_file, 'w').close()
+    outbox_path = os.path.join(workdir, 'outbox.db')
+    names = [f"lane{i + 1}" for i in range(args.lanes)]
+    seeds = {name: args.seed + i for i, name in enumerate(names)}
+    scenarios = [sim.Scenario.synthetic(count=args.items, seed=seeds[name]) for name in names]
+    duration = max(scenario.duration for scenario in scenarios)
+
+    with StubServer() as server:
+        shared = {'SERVER_URL': server.url, 'OUTBOX_PATH': outbox_path, 'OUTBOX_BATCH_SIZE': 1}
+        lanes = [Lane(name, dict(shared, MODEL_FILE=model_file, METRICS_PORT=None,
+                                 CALIBRATION_FILE=os.path.join(workdir, f"calibration-{name}.json")))
+                 for name in names]
+        setup = functools.partial(setup_lane, seeds, args.items, args.model_init)
+        supervisor = LaneSupervisor(lanes, shared, setup=setup)
+        start = time.monotonic()
+        with open(os.devnull, 'w') as devnull:
+            # Lanes inherit stdout; keep their per-frame output off the report.
+            stdout = os.dup(1)
+            os.dup2(devnull.fileno(), 1)
+            try:
+                supervisor.start()
+                killed = False
+                expected = args.lanes * args.items
+                deadline = start + args.model_init + duration + args.settle
+                while time.monotonic() < deadline and len(server.received) < expected:
+                    if args.kill_after and not killed and time.monotonic() - start > args.kill_after:
+                        os.kill(supervisor.pids()['lane1'], signal.SIGKILL)
+                        killed = True
+                    supervisor.poll()
+                    time.sleep(0.1)
+                wall = time.monotonic() - start
+                supervisor.stop()
+            finally:
+                os.dup2(stdout, 1)
+                os.close(stdout)
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = usage.ru_utime + usage.ru_stime
+        errors, wrong = match(scenarios, server)
+
+    delivered = len(server.received)
+    print(f"Lanes: {args.lanes}, {args.items} items each, scenarios up to {duration:.1f}s")
+    print(f"Delivered: {delivered}/{expected} in {wall:.1f}s, duplicates {server.duplicates}")
+    print(f"Throughput: {delivered / (duration / 60.0):.1f} items/min "
+          f"({delivered / args.lanes / (duration / 60.0):.1f} per lane)")
+    print(f"Label accuracy: {delivered - wrong}/{delivered}")
+    print(f"Weight error: mean {sum(errors) / max(1, len(errors)):.1f}g max {max(errors, default=0):.1f}g")
+    print(f"Restarts: {supervisor.restarts()}")
+    print(f"CPU: {cpu:.1f}s over {wall:.1f}s wall ({cpu / wall:.0%} of one core, "
+          f"{os.cpu_count()} cores)")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,287 @@
+#!/usr/bin/python3
+"""Compare Edge Impulse model builds on recorded frames.
+
+Loads each .eim through ImageImpulseRunner and classifies every frame in a
+directory of labeled recordings, one subdirectory per model label (frames
+in none/, empty/ or background/ show an empty scale):
+
+    frames/Apple/0001.png
+    frames/Lays/0001.png
+    frames/none/0001.png
+
+For each model it reports init time, per-frame latency percentiles (the
+runner's get_features_from_image() and classify() separately), throughput,
+how much this process's memory grew while running the model, the memory
+of the model process the runner starts, and precision/recall per label. A frame counts as showing the label of its
+highest-scoring bounding box or classification score at or above
+--threshold, so object detection and classification builds are compared
+the same way. Every model sees the same frames, loaded before timing.
+
+    python bench_model.py frames/ autobill_fyp-linux-aarch64-v6.eim automationcheckout_fyp-linux-aarch64-v4.eim
+
+Without a model binary (CI), --stub runs sim.py's runner instead, which
+reads the product off frames written by --make-frames:
+
+    python bench_model.py --make-frames /tmp/frames --count 20
+    python bench_model.py /tmp/frames --stub [--stub-type classification]
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+
+EMPTY_LABELS = ('none', 'empty', 'background')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return float('nan')
+    index = min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def load_frames(directory, limit=None):
+    # [(label or None, path, RGB image)], in a stable order.
+    frames = []
+    for name in sorted(os.listdir(directory)):
+        label_dir = os.path.join(directory, name)
+        if not os.path.isdir(label_dir):
+            continue
+        label = None if name.lower() in EMPTY_LABELS else name
+        paths = sorted(os.path.join(label_dir, f) for f in os.listdir(label_dir)
+                       if f.lower().endswith(IMAGE_EXTENSIONS))
+        for path in paths[:limit]:
+            img = cv2.imread(path)
+            if img is None:
+                print(f"Skipping unreadable frame {path}")
+                continue
+            frames.append((label, path, cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
+    return frames
+
+
+def make_frames(directory, count, labels, seed=0):
+    import numpy as np
+
+    import sim
+    rng = np.random.default_rng(seed)
+    for label in list(labels) + [None]:
+        label_dir = os.path.join(directory, label or 'none')
+        os.makedirs(label_dir, exist_ok=True)
+        for i in range(count):
+            frame = sim.render_frame([label] if label else [], rng=rng)
+            cv2.imwrite(os.path.join(label_dir, f"{i:04d}.png"), cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    print(f"Wrote {count} frames each for {len(labels)} labels and none to {directory}")
+
+
+def prediction(result, threshold):
+    # The label a frame is taken to show, or None.
+    if 'bounding_boxes' in result:
+        pairs = [(box['label'], box['value']) for box in result['bounding_boxes']]
+    else:
+        pairs = list(result.get('classification', {}).items())
+    label, score = max(pairs, key=lambda pair: pair[1], default=(None, 0.0))
+    return label if score >= threshold else None
+
+
+def _status_kb(pid, field):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid):
+    # The runner starts the .eim as a child process and talks to it over a
+    # socket, so most of a model's memory is not this process's.
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def memory():
+    # (this process's RSS, model processes' RSS, their peak RSS), in MB.
+    pid = os.getpid()
+    children = _children(pid)
+    return (_status_kb(pid, 'VmRSS') / 1024.0,
+            sum(_status_kb(child, 'VmRSS') for child in children) / 1024.0,
+            sum(_status_kb(child, 'VmHWM') for child in children) / 1024.0)
+
+
+def bench(runner_class, modelfile, frames, threshold, warmup):
+    result = {'model': modelfile}
+    # Models run one after another in this process, so its lifetime peak
+    # RSS would stay that of the largest; report each model's growth.
+    rss_before = memory()[0]
+    start = time.perf_counter()
+    with runner_class(modelfile) as runner:
+        try:
+            model_info = runner.init()
+            result['init_s'] = time.perf_counter() - start
+            params = model_info['model_parameters']
+            result['model_type'] = params.get('model_type', 'classification')
+            labels = params['labels']
+            result['labels'] = labels
+            result['rss_mb_after_init'] = memory()
+            for label in sorted({label for label, _, _ in frames if label} - set(labels)):
+                print(f"{modelfile}: frames labeled {label!r} but the model has no such label")
+
+            for _, _, img in frames[:warmup]:
+                features, cropped = runner.get_features_from_image(img)
+                runner.classify(features)
+
+            feature_times, classify_times, model_ms = [], [], []
+            counts = {label: [0, 0, 0] for label in labels}  # true positives, false positives, false negatives
+            correct = 0
+            wall = time.perf_counter()
+            for truth, path, img in frames:
+                t0 = time.perf_counter()
+                features, cropped = runner.get_features_from_image(img)
+                t1 = time.perf_counter()
+                res = runner.classify(features)
+                t2 = time.perf_counter()
+                feature_times.append(t1 - t0)
+                classify_times.append(t2 - t1)
+                timing = res.get('timing', {})
+                model_ms.append(timing.get('dsp', 0) + timing.get('classification', 0))
+                predicted = prediction(res.get('result', {}), threshold)
+                if predicted == truth:
+                    correct += 1
+                    if truth is not None:
+                        counts.setdefault(truth, [0, 0, 0])[0] += 1
+                    continue
+                if predicted is not None:
+                    counts.setdefault(predicted, [0, 0, 0])[1] += 1
+                if truth is not None:
+                    counts.setdefault(truth, [0, 0, 0])[2] += 1
+            wall = time.perf_counter() - wall
+            result['memory_mb'] = memory()
+        finally:
+            runner.stop()
+
+    result.update({
+        'frames': len(frames),
+        'throughput_fps': len(frames) / wall if wall else float('nan'),
+        'accuracy': correct / len(frames) if frames else float('nan'),
+        'features_ms': {q: percentile(feature_times, q) * 1e3 for q in (50, 90, 99)},
+        'classify_ms': {q: percentile(classify_times, q) * 1e3 for q in (50, 90, 99)},
+        'classify_max_ms': max(classify_times, default=float('nan')) * 1e3,
+        'model_reported_ms': sum(model_ms) / len(model_ms) if model_ms else float('nan'),
+        'per_label': {},
+    })
+    for label, (tp, fp, fn) in counts.items():
+        result['per_label'][label] = {
+            'tp': tp, 'fp': fp, 'fn': fn,
+            'precision': tp / (tp + fp) if tp + fp else float('nan'),
+            'recall': tp / (tp + fn) if tp + fn else float('nan'),
+        }
+    result['bench_rss_growth_mb'] = result['memory_mb'][0] - rss_before
+    return result
+
+
+def report(result):
+    rss, model_rss, model_peak = result['memory_mb']
+    print(f"== {result['model']} ({result['model_type']}, {len(result['labels'])} labels)")
+    print(f"Init: {result['init_s']:.2f}s")
+    print(f"Features: p50 {result['features_ms'][50]:.1f} ms  p90 {result['features_ms'][90]:.1f} ms  "
+          f"p99 {result['features_ms'][99]:.1f} ms")
+    print(f"Classify: p50 {result['classify_ms'][50]:.1f} ms  p90 {result['classify_ms'][90]:.1f} ms  "
+          f"p99 {result['classify_ms'][99]:.1f} ms  max {result['classify_max_ms']:.1f} ms  "
+          f"(model reports {result['model_reported_ms']:.1f} ms)")
+    print(f"Throughput: {result['throughput_fps']:.1f} frames/s over {result['frames']} frames")
+    print(f"Memory: bench {rss:.0f} MB ({result['bench_rss_growth_mb']:+.0f} MB during the run), "
+          f"model process {model_rss:.0f} MB (peak {model_peak:.0f} MB)")
+    print(f"Accuracy: {result['accuracy']:.1%}")
+    print(f"  {'label':<20} {'precision':>9} {'recall':>7} {'tp':>5} {'fp':>5} {'fn':>5}")
+    for label, stats in sorted(result['per_label'].items()):
+        print(f"  {label:<20} {stats['precision']:>9.2f} {stats['recall']:>7.2f} "
+              f"{stats['tp']:>5} {stats['fp']:>5} {stats['fn']:>5}")
+
+
+def compare(results):
+    print("== Comparison")
+    print(f"  {'model':<44} {'init s':>7} {'p50 ms':>7} {'p99 ms':>7} {'fps':>7} {'bench +MB':>10} "
+          f"{'model peak MB':>14} {'accuracy':>9}")
+    for result in results:
+        print(f"  {os.path.basename(result['model']):<44} {result['init_s']:>7.2f} "
+              f"{result['classify_ms'][50]:>7.1f} {result['classify_ms'][99]:>7.1f} "
+              f"{result['throughput_fps']:>7.1f} {result['bench_rss_growth_mb']:>+10.0f} "
+              f"{result['memory_mb'][2]:>14.0f} {result['accuracy']:>9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('frames', nargs='?', help="directory with one subdirectory of frames per label")
+    parser.add_argument('models', nargs='*', help=".eim files to compare")
+    parser.add_argument('--threshold', type=float, default=0.7,
+                        help="lowest score counted as a detection (MIN_CONFIDENCE in main.py)")
+    parser.add_argument('--warmup', type=int, default=5, help="untimed frames classified first")
+    parser.add_argument('--limit', type=int, help="at most this many frames per label")
+    parser.add_argument('--json', metavar='FILE', help="also write the results to FILE")
+    parser.add_argument('--stub', action='store_true', help="use sim.py's runner instead of loading the models")
+    parser.add_argument('--stub-type', choices=('object_detection', 'classification'),
+                        default='object_detection')
+    parser.add_argument('--stub-latency', type=float, default=0.01)
+    parser.add_argument('--make-frames', metavar='DIR', help="write synthetic labeled frames to DIR and exit")
+    parser.add_argument('--count', type=int, default=20, help="frames per label for --make-frames")
+    args = parser.parse_intermixed_args()
+
+    if args.make_frames:
+        import sim
+        make_frames(args.make_frames, args.count, sorted(sim.DEFAULT_PRODUCTS))
+        return
+    if not args.frames:
+        parser.error("a frames directory is required")
+
+    if args.stub:
+        import sim
+
+        def runner_class(modelfile):
+            return sim.FakeImageImpulseRunner(modelfile, latency=args.stub_latency,
+                                              model_type=args.stub_type)
+        models = args.models or ['stub.eim']
+    else:
+        from edge_impulse_linux.image import ImageImpulseRunner as runner_class
+        models = args.models
+        if not models:
+            parser.error("no models given (or use --stub)")
+
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        parser.error(f"no frames found in {args.frames}")
+    labeled = sum(1 for label, _, _ in frames if label)
+    print(f"Frames: {len(frames)} ({labeled} with a product, {len(frames) - labeled} empty)")
+
+    results = []
+    for modelfile in models:
+        if not args.stub and not os.path.exists(modelfile):
+            print(f"Model file not found at {modelfile}")
+            continue
+        result = bench(runner_class, modelfile, frames, args.threshold, args.warmup)
+        report(result)
+        results.append(result)
+    if len(results) > 1:
+        compare(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
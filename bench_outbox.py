@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+"""Throughput and durability check for the detections outbox.
+
+Runs against stub_server.py on localhost:
+  * sustained detections/sec for a few batch sizes,
+  * a server outage in the middle of a stream,
+  * a process restart with detections still queued on disk.
+Exits non-zero if any detection is lost or delivered twice.
+
+    python bench_outbox.py [--count 500]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import logzero
+from outbox import Outbox, OutboxSender
+from stub_server import StubServer
+
+
+def detection(i):
+    return {"product": "Apple", "weight": 100.0 + i % 50, "price": 11.0}
+
+
+def wait_drained(outbox, server, expected, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if outbox.count() == 0 and len(server.received) >= expected:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def check(name, server, expected):
+    ok = len(server.received) == expected and server.duplicates == 0
+    print(f"{name:<28}{len(server.received):>6}/{expected:<6} duplicates={server.duplicates} "
+          f"{'OK' if ok else 'LOST'}")
+    return ok
+
+
+def bench_throughput(path, count, batch_size, latency):
+    with StubServer(latency=latency) as server:
+        outbox = Outbox(path)
+        sender = OutboxSender(outbox, server.url, batch_size=batch_size)
+        sender.start()
+        start = time.perf_counter()
+        for i in range(count):
+            outbox.add(detection(i))
+        drained = wait_drained(outbox, server, count, timeout=120)
+        elapsed = time.perf_counter() - start
+        sender.stop()
+        outbox.close()
+        print(f"batch={batch_size:<3} {count / elapsed:>10.0f} detections/s "
+              f"{server.requests:>6} requests{'' if drained else '  (timed out)'}")
+        return check(f"  delivered (batch={batch_size})", server, count)
+
+
+def bench_outage(path, count):
+    with StubServer() as server:
+        outbox = Outbox(path)
+        sender = OutboxSender(outbox, server.url, batch_size=10, backoff=0.05, max_backoff=0.5)
+        sender.start()
+        for i in range(count):
+            if i == count // 4:
+                server.down = True
+            if i == count // 2:
+                time.sleep(1.0)
+                server.down = False
+            outbox.add(detection(i))
+        wait_drained(outbox, server, count, timeout=60)
+        sender.stop()
+        outbox.close()
+        return check("server outage", server, count)
+
+
+def bench_restart(path, count):
+    with StubServer() as server:
+        # First "process": queue everything, die before the sender runs.
+        outbox = Outbox(path)
+        for i in range(count):
+            outbox.add(detection(i))
+        outbox.close()
+        # Second "process": picks the backlog up from disk.
+        outbox = Outbox(path)
+        sender = OutboxSender(outbox, server.url, batch_size=10)
+        sender.start()
+        wait_drained(outbox, server, count, timeout=60)
+        sender.stop()
+        outbox.close()
+        return check("restart with backlog", server, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help="simulated server latency per request in seconds")
+    args = parser.parse_args()
+    logzero.loglevel(logging.ERROR)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in (1, 10, 50):
+            ok &= bench_throughput(os.path.join(tmp, f"tp{batch_size}.db"), args.count,
+                                   batch_size, args.latency)
+        ok &= bench_outage(os.path.join(tmp, "outage.db"), args.count)
+        ok &= bench_restart(os.path.join(tmp, "restart.db"), args.count)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
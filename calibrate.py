@@ -1,60 +1,81 @@
 #!/usr/bin/python3
+import os
 import time
 import sys
 import gpiod
 from hx711 import HX711
+from calibration import Calibrator, CalibrationError
+
+# main.py loads this at boot instead of using its built-in REFERENCE_UNIT.
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "calibration.json")
 
 try:
     # Initialize gpiod chip
     print("Initializing GPIO...")
     chip = gpiod.Chip("0", gpiod.Chip.OPEN_BY_NUMBER)
-    
+
     # Initialize HX711
     print("Initializing HX711...")
     hx = HX711(dout=38, pd_sck=40, gain=128, chip=chip)
-    
-    # Reset and tare
+
+    # Reset and measure the empty scale
     print("\nResetting scale...")
     hx.reset()
     time.sleep(0.5)
-    
-    print("\nTaring...")
-    offset = hx.tare(15)  # Use 15 readings for better accuracy
-    print("Tare complete")
-    
-    print("\nPut a known weight on the scale...")
+    calibrator = Calibrator(hx)
+
+    print("\nRemove everything from the scale...")
     input("Press Enter when ready")
-    
-    # Get weight reading
-    val = hx.get_weight(5)  # Average of 5 readings
-    print(f"\nRaw value: {val}")
-    weight = input("Enter exact weight in grams: ")
-    
+    calibrator.measure_zero()
+    print(f"Empty scale noise: {calibrator.noise:.0f} counts")
+
+    # Several reference weights spread over the range you weigh give a
+    # better fit than one; four or more also correct the nonlinearity.
+    print("\nPut reference weights on the scale one at a time.")
+    print("Leave the weight empty and press Enter when done.")
+    while True:
+        weight = input("\nExact weight in grams: ").strip()
+        if not weight:
+            break
+        try:
+            weight_value = float(weight)
+        except ValueError:
+            print("Invalid weight entered!")
+            continue
+        print("Waiting for the scale to settle...")
+        try:
+            raw = calibrator.measure(weight_value)
+        except CalibrationError as e:
+            print(f"{e}, try again")
+            continue
+        print(f"Raw value: {raw:.0f}")
+
     try:
-        weight_value = float(weight)
-        # Calculate reference unit
-        reference_unit = val / weight_value
-        print(f"\nReference unit: {reference_unit}")
-        print("Save this reference unit for your main program")
-        
-        # Set the reference unit
-        hx.set_reference_unit(reference_unit)
-        
-        print("\nTesting scale with new reference unit...")
-        print("Add or remove weights to test")
-        print("Press CTRL+C to exit\n")
-        
-        while True:
-            val = hx.get_weight(5)  # Average of 5 readings
-            print(f"Weight: {val:.1f}g")
-            hx.power_down()
-            hx.power_up()
-            time.sleep(0.5)
-            
-    except ValueError:
-        print("Invalid weight entered!")
+        profile = calibrator.fit()
+    except CalibrationError as e:
+        print(f"Calibration failed: {e}")
         sys.exit(1)
 
+    print(f"\nReference unit: {profile.reference_unit}")
+    print(f"Nonlinearity: {profile.nonlinearity:.3e} g/count^2")
+    for point, error in zip(profile.points, profile.errors()):
+        print(f"  {point.weight_g:>8.1f}g  error {error:+.2f}g")
+    print(f"RMS error: {profile.residual_g:.2f}g")
+
+    # Apply it and save it with the tare for main.py
+    profile.apply(hx)
+    profile.save(CALIBRATION_FILE)
+    print(f"Saved calibration to {CALIBRATION_FILE}")
+
+    print("\nTesting scale with the new calibration...")
+    print("Add or remove weights to test")
+    print("Press CTRL+C to exit\n")
+
+    while True:
+        val = hx.get_weight(5)  # Median of 5 readings
+        print(f"Weight: {val:.1f}g")
+        time.sleep(0.5)
+
 except (KeyboardInterrupt, SystemExit):
     print("\nCleaning up...")
     sys.exit()
@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+"""Multi-point load cell calibration and automatic zero tracking.
+
+Calibrator collects settled readings of the empty scale and of several
+reference weights and fits
+
+    grams = x / reference_unit + nonlinearity * x**2,   x = raw - offset
+
+by least squares. The quadratic term corrects the bow in the load cell's
+response across the weighing range; with fewer than four points the fit is
+linear. The result is a CalibrationProfile, saved in the same file format
+as HX711.save_calibration() so main.py picks it up at boot.
+
+ZeroTracker follows the filters.py protocol. While the scale is empty and
+still it moves the tare toward the current reading at a bounded rate, so
+temperature drift and the slow return of the cell after a load is removed
+do not build up into a standing error.
+"""
+import json
+import math
+import os
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+CalibrationPoint = namedtuple('CalibrationPoint', ['weight_g', 'raw', 'noise'])
+
+
+class CalibrationError(ValueError):
+    pass
+
+
+class CalibrationProfile:
+    def __init__(self, offset, reference_unit, nonlinearity=0.0, gain=128, points=(),
+                 residual_g=None):
+        self.offset = offset
+        self.reference_unit = reference_unit
+        self.nonlinearity = nonlinearity
+        self.gain = gain
+        self.points = [CalibrationPoint(*point) for point in points]
+        self.residual_g = residual_g
+
+    def to_grams(self, raw):
+        x = raw - self.offset
+        return x / self.reference_unit + self.nonlinearity * x * x
+
+    def errors(self):
+        # Fitted minus true weight for every calibration point.
+        return [self.to_grams(point.raw) - point.weight_g for point in self.points]
+
+    def apply(self, hx):
+        hx.set_offset_A(self.offset)
+        hx.set_reference_unit_A(self.reference_unit)
+        hx.NONLINEARITY = self.nonlinearity
+
+    def to_dict(self):
+        return {
+            'gain': self.gain,
+            'offset': self.offset,
+            'reference_unit': self.reference_unit,
+            'nonlinearity': self.nonlinearity,
+            'residual_g': self.residual_g,
+            'points': [point._asdict() for point in self.points],
+            'saved_at': time.time(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        points = [(p['weight_g'], p['raw'], p.get('noise', 0.0)) for p in data.get('points', [])]
+        return cls(data['offset'], data['reference_unit'], data.get('nonlinearity', 0.0),
+                   data.get('gain', 128), points, data.get('residual_g'))
+
+    def save(self, path):
+        # Merged into an existing file so channel B settings saved by
+        # HX711.save_calibration() survive.
+        data = {}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        data.update(self.to_dict())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def fit(points, nonlinear=None, gain=128):
+    """Least-squares CalibrationProfile for (weight_g, raw[, noise]) points.
+
+    One point must be the empty scale (0 g). nonlinear=None fits the
+    quadratic term only when there are at least four distinct weights, so
+    there is a degree of freedom left to check it against.
+    """
+    points = [CalibrationPoint(*point) if len(point) == 3 else CalibrationPoint(*point, 0.0)
+              for point in points]
+    weights = sorted({point.weight_g for point in points})
+    if 0 not in weights:
+        raise CalibrationError("calibration needs an empty-scale (0 g) point")
+    if len(weights) < 2:
+        raise CalibrationError("calibration needs at least one reference weight")
+    if nonlinear is None:
+        nonlinear = len(weights) >= 4
+    elif nonlinear and len(weights) < 3:
+        raise CalibrationError("a nonlinear fit needs at least two reference weights")
+
+    # Fit around the empty-scale reading so the squared term stays well
+    # conditioned: w = b0 + b1*x + b2*x^2 with x = raw - r0.
+    r0 = np.mean([point.raw for point in points if point.weight_g == 0])
+    x = np.array([point.raw for point in points], dtype=float) - r0
+    w = np.array([point.weight_g for point in points], dtype=float)
+    columns = [np.ones_like(x), x] + ([x * x] if nonlinear else [])
+    coefficients = np.linalg.lstsq(np.column_stack(columns), w, rcond=None)[0]
+    b0, b1 = coefficients[:2]
+    b2 = coefficients[2] if nonlinear else 0.0
+    if b1 == 0:
+        raise CalibrationError("reference weights did not change the reading")
+
+    # Move the origin to where the fit crosses 0 g (the root nearest r0) and
+    # re-express the slope there.
+    if b2:
+        disc = b1 * b1 - 4 * b2 * b0
+        if disc < 0:
+            raise CalibrationError("nonlinear fit has no zero crossing; check the points")
+        roots = [(-b1 + sign * math.sqrt(disc)) / (2 * b2) for sign in (1, -1)]
+        x0 = min(roots, key=abs)
+    else:
+        x0 = -b0 / b1
+    slope = b1 + 2 * b2 * x0
+    profile = CalibrationProfile(float(r0 + x0), float(1.0 / slope), float(b2), gain, points)
+    errors = profile.errors()
+    profile.residual_g = math.sqrt(sum(e * e for e in errors) / len(errors))
+    return profile
+
+
+class Calibrator:
+    """Collects settled calibration points from an HX711.
+
+    A point is taken once the last `samples` readings vary by less than
+    `settle_sigma` times the empty-scale noise (at least `min_noise`
+    counts), so a weight still swinging on the plate is never recorded.
+    """
+
+    def __init__(self, hx, samples=20, settle_sigma=4.0, min_noise=20.0, timeout=30.0):
+        self.hx = hx
+        self.samples = samples
+        self.settle_sigma = settle_sigma
+        self.min_noise = min_noise
+        self.timeout = timeout
+        self.noise = None
+        self.points = []
+
+    def read_settled(self, tolerance=None):
+        # Mean and standard deviation of the first quiet window.
+        window = deque(maxlen=self.samples)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            window.append(self.hx.read_long())
+            if len(window) == self.samples:
+                mean = sum(window) / len(window)
+                std = math.sqrt(sum((v - mean) ** 2 for v in window) / len(window))
+                if tolerance is None or std <= tolerance:
+                    return mean, std
+            if time.monotonic() > deadline:
+                raise CalibrationError(f"scale did not settle within {self.timeout}s")
+
+    def measure_zero(self):
+        raw, std = self.read_settled()
+        self.noise = max(std, self.min_noise)
+        self.points = [p for p in self.points if p.weight_g != 0]
+        self.points.append(CalibrationPoint(0.0, raw, std))
+        return raw
+
+    def measure(self, weight_g):
+        if self.noise is None:
+            raise CalibrationError("measure the empty scale first")
+        raw, std = self.read_settled(self.noise * self.settle_sigma)
+        self.points.append(CalibrationPoint(float(weight_g), raw, std))
+        return raw
+
+    def fit(self, nonlinear=None):
+        return fit(self.points, nonlinear, self.hx.get_gain())
+
+
+class ZeroTracker:
+    """Automatic zero tracking, fed raw samples like any HX711 filter.
+
+    Only acts while the mean of the last `window` samples is within `band`
+    grams of zero and their standard deviation is under `stable` grams; the
+    tare then follows at no more than `rate` grams per second, so an item is
+    never tracked away.
+    """
+
+    def __init__(self, hx, band=0.5, rate=0.25, window=10, stable=0.5):
+        self.hx = hx
+        self.band = band
+        self.rate = rate
+        self.stable = stable
+        self.total_correction = 0.0
+        self._raws = deque(maxlen=window)
+        self._last = None
+
+    def add(self, raw):
+        now = time.monotonic()
+        last, self._last = self._last, now
+        self._raws.append(raw)
+        if len(self._raws) < self._raws.maxlen or last is None:
+            return
+        hx = self.hx
+        mean = sum(self._raws) / len(self._raws)
+        std = math.sqrt(sum((v - mean) ** 2 for v in self._raws) / len(self._raws))
+        drift = mean - hx.get_offset_A()
+        if abs(hx.value_to_weight(std)) > self.stable or abs(hx.value_to_weight(drift)) > self.band:
+            return
+        limit = self.rate * (now - last) * abs(hx.get_reference_unit_A())
+        step = max(-limit, min(limit, drift))
+        hx.set_offset_A(hx.get_offset_A() + step)
+        self.total_correction += step / hx.get_reference_unit_A()
+
+    def ready(self):
+        return True
+
+    def value(self):
+        return self.total_correction
+
+    def reset(self):
+        self._raws.clear()
+        self._last = None
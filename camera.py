@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+"""Low-latency camera capture on its own thread.
+
+The capture thread keeps calling grab(), which pulls frames off the driver
+without decoding them, so there is never a backlog of stale frames. A frame
+is decoded (retrieve()), cropped to the scale-plate ROI, resized and
+converted to RGB only when a consumer asks for one, so every inference
+sees the scene as it is now and no time is spent on frames that would be
+dropped.
+"""
+import threading
+import time
+
+import cv2
+from logzero import logger
+
+
+class CameraError(RuntimeError):
+    pass
+
+
+class CameraCapture:
+    def __init__(self, index=0, roi=None, size=None, width=None, height=None):
+        # roi is (x, y, w, h) in camera pixels, size is the (w, h) to resize
+        # to after cropping, normally the model's input size.
+        self.index = index
+        self.roi = roi
+        self.size = size
+        self.width = width
+        self.height = height
+        self.grabbed = 0
+        self.delivered = 0
+        self._capture = None
+        self._thread = None
+        self._running = False
+        self._wanted = threading.Event()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._seq = 0
+        self._error = None
+
+    def start(self):
+        capture = cv2.VideoCapture(self.index)
+        if not capture.isOpened():
+            raise CameraError(f"Cannot open camera {self.index}")
+        # Ask the driver for the shortest queue it supports.
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if self.width:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self._capture = capture
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name='camera', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def prepare(self, frame):
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            frame = frame[y:y + h, x:x + w]
+        if self.size is not None:
+            # Center-crop to the target aspect ratio first, like the Edge
+            # Impulse runner does, so objects are not squashed.
+            width, height = self.size
+            h, w = frame.shape[:2]
+            if w * height > h * width:
+                crop = h * width // height
+                frame = frame[:, (w - crop) // 2:(w - crop) // 2 + crop]
+            elif w * height < h * width:
+                crop = w * height // width
+                frame = frame[(h - crop) // 2:(h - crop) // 2 + crop]
+            if (frame.shape[1], frame.shape[0]) != (width, height):
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def _capture_loop(self):
+        failures = 0
+        while self._running:
+            if not self._capture.grab():
+                failures += 1
+                if failures >= 50:
+                    self._fail(CameraError(f"Camera {self.index} stopped delivering frames"))
+                    return
+                time.sleep(0.02)
+                continue
+            failures = 0
+            timestamp = time.monotonic()
+            self.grabbed += 1
+            if not self._wanted.is_set():
+                continue
+            ok, frame = self._capture.retrieve()
+            if not ok:
+                continue
+            try:
+                frame = self.prepare(frame)
+            except cv2.error as e:
+                self._fail(CameraError(f"Cannot prepare frame: {e}"))
+                return
+            with self._cond:
+                self._wanted.clear()
+                self._frame = frame
+                self._timestamp = timestamp
+                self._seq += 1
+                self._cond.notify_all()
+
+    def _fail(self, error):
+        logger.error(str(error))
+        with self._cond:
+            self._error = error
+            self._cond.notify_all()
+
+    def read(self, timeout=2.0):
+        # The next frame grabbed after this call, as (timestamp, RGB image).
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            seq = self._seq
+            self._wanted.set()
+            if not self._cond.wait_for(lambda: self._seq != seq or self._error is not None, timeout):
+                raise CameraError(f"No frame from camera {self.index} within {timeout}s")
+            if self._error is not None:
+                raise self._error
+            self.delivered += 1
+            return self._timestamp, self._frame
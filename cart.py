@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+"""Per-customer cart sessions.
+
+A CartSession holds the items billed to one customer in arrays allocated
+once, `capacity` slots long. A free-slot stack makes add() and remove()
+O(1), running totals are kept as items come and go, and close() hands back
+the receipt and clears the same arrays for the next customer, so a lane's
+memory stays flat however many customers it serves.
+
+Everything billed is expected to stay on the scale until checkout.
+reconcile() compares the cart's total with the settled scale reading:
+less on the scale than billed means an item was taken off, more means
+something was put down without being billed.
+"""
+import itertools
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+DEFAULT_CAPACITY = 128
+BALANCED = 'balanced'
+MISSING = 'missing'  # the scale reads less than the cart: an item was taken off
+UNBILLED = 'unbilled'  # the scale reads more than the cart: an item was not billed
+
+CartItem = namedtuple('CartItem', ['handle', 'label', 'weight_g', 'price', 'added_at'])
+Reconciliation = namedtuple('Reconciliation', ['status', 'delta_g', 'item'])
+Receipt = namedtuple('Receipt', ['session', 'items', 'total_weight_g', 'total_price',
+                                 'opened_at', 'closed_at'])
+
+_session_ids = itertools.count(1)
+
+
+class CartFullError(OverflowError):
+    pass
+
+
+class CartSession:
+    """One customer's cart, reused for the next customer after close().
+
+    Item handles returned by add() are slot numbers, valid until the item
+    is removed or the session closed. `tolerance_g` plus `relative_tolerance`
+    of the cart's weight is how far the scale may differ from the cart and
+    still count as balanced, and how close a removed weight must be to an
+    item's to be matched to it.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, tolerance_g=5.0, relative_tolerance=0.01):
+        self.capacity = capacity
+        self.tolerance_g = tolerance_g
+        self.relative_tolerance = relative_tolerance
+        self._lock = threading.Lock()
+        self._labels = [None] * capacity
+        self._weights = array('d', bytes(8 * capacity))
+        self._prices = array('d', bytes(8 * capacity))
+        self._added_at = array('d', bytes(8 * capacity))
+        self._reset()
+
+    def _reset(self):
+        for slot in range(self.capacity):
+            self._labels[slot] = None
+        self._free = array('i', range(self.capacity - 1, -1, -1))
+        self._last = None
+        self.total_weight_g = 0.0
+        self.total_price = 0.0
+        self.session = next(_session_ids)
+        self.opened_at = time.time()
+
+    def __len__(self):
+        return self.capacity - len(self._free)
+
+    def __iter__(self):
+        # Items in the order they were added.
+        with self._lock:
+            items = [self._item(slot) for slot in self._occupied()]
+        return iter(sorted(items, key=lambda item: item.added_at))
+
+    def _occupied(self):
+        return [slot for slot in range(self.capacity) if self._labels[slot] is not None]
+
+    def _item(self, slot):
+        return CartItem(slot, self._labels[slot], self._weights[slot], self._prices[slot],
+                        self._added_at[slot])
+
+    def tolerance(self):
+        return self.tolerance_g + self.relative_tolerance * self.total_weight_g
+
+    def add(self, label, weight_g, price, now=None):
+        with self._lock:
+            if not self._free:
+                raise CartFullError(f"cart: session {self.session} is full ({self.capacity} items)")
+            slot = self._free.pop()
+            self._labels[slot] = label
+            self._weights[slot] = weight_g
+            self._prices[slot] = price
+            self._added_at[slot] = time.time() if now is None else now
+            self._last = slot
+            self.total_weight_g += weight_g
+            self.total_price += price
+            return slot
+
+    def last(self):
+        # The most recently added item still in the cart, or None.
+        with self._lock:
+            return None if self._last is None else self._item(self._last)
+
+    def remove(self, handle):
+        with self._lock:
+            if not 0 <= handle < self.capacity or self._labels[handle] is None:
+                raise KeyError(handle)
+            return self._remove(handle)
+
+    def _remove(self, slot):
+        item = self._item(slot)
+        self._labels[slot] = None
+        self._free.append(slot)
+        if slot == self._last:
+            self._last = None
+        if len(self._free) == self.capacity:
+            # Empty again; start the totals from exactly zero so rounding
+            # does not build up over a long session.
+            self.total_weight_g = 0.0
+            self.total_price = 0.0
+        else:
+            self.total_weight_g -= item.weight_g
+            self.total_price -= item.price
+        return item
+
+    def _closest(self, weight_g):
+        # Slot of the item weighing closest to `weight_g`, within tolerance.
+        tolerance = self.tolerance()
+        best, best_error = None, None
+        for slot in self._occupied():
+            error = abs(self._weights[slot] - weight_g)
+            if error <= tolerance and (best is None or error < best_error):
+                best, best_error = slot, error
+        return best
+
+    def remove_weight(self, weight_g):
+        # Removes and returns the item a weight taken off the scale belongs
+        # to, or None when no item matches.
+        with self._lock:
+            slot = self._closest(weight_g)
+            return None if slot is None else self._remove(slot)
+
+    def reconcile(self, scale_weight_g):
+        with self._lock:
+            delta = scale_weight_g - self.total_weight_g
+            if abs(delta) <= self.tolerance():
+                return Reconciliation(BALANCED, delta, None)
+            if delta < 0:
+                slot = self._closest(-delta)
+                return Reconciliation(MISSING, delta, None if slot is None else self._item(slot))
+            return Reconciliation(UNBILLED, delta, None)
+
+    def close(self, now=None):
+        # Receipt for the customer; the session is empty and renumbered
+        # afterwards, ready for the next one.
+        with self._lock:
+            items = tuple(sorted((self._item(slot) for slot in self._occupied()),
+                                 key=lambda item: item.added_at))
+            receipt = Receipt(self.session, items, sum(item.weight_g for item in items),
+                              sum(item.price for item in items), self.opened_at,
+                              time.time() if now is None else now)
+            self._reset()
+        return receipt
@@ -0,0 +1,252 @@
+#!/usr/bin/python3
+"""Product catalog and pricing.
+
+Products are loaded from a JSON or CSV file and compiled into flat numpy
+tables indexed by product id, so pricing a whole cart is a handful of
+array operations however many SKUs the store has. Each product is keyed
+by the label the model reports for it and may have:
+
+  base_price   charged once per item
+  rate         price per gram
+  tiers        heavier items are charged a different rate per gram from a
+               weight upward, e.g. [{"from_g": 500, "rate": 0.008}]
+  discount     promotion as a fraction off (0.1 = 10% off), optionally
+               limited to promo_start..promo_end (ISO dates or times)
+  weight_g     typical weight of one item in grams, used by fusion.py to
+               tell products apart
+  weight_std_g how much that weight varies (standard deviation, grams)
+
+JSON files hold a list of product objects (or {"products": [...]}); CSV
+files have the columns label, sku, name, base_price, rate, tiers (written
+"500:0.008;1000:0.006"), discount, promo_start, promo_end, weight_g and
+weight_std_g.
+
+Catalog.watch() reloads the file in the background when it changes. A
+reload compiles a new set of tables and swaps them in with one attribute
+assignment, so pricing never waits for it.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from logzero import logger
+
+UNKNOWN = -1
+# Below this many items numpy's per-call overhead outweighs the per-item
+# loop, so price_cart() prices small carts item by item.
+VECTOR_MIN_ITEMS = 64
+
+
+class UnknownProductError(KeyError):
+    pass
+
+
+def _timestamp(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _parse_tiers(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [(float(tier['from_g']), float(tier['rate'])) for tier in value]
+    tiers = []
+    for part in value.split(';'):
+        from_g, rate = part.split(':')
+        tiers.append((float(from_g), float(rate)))
+    return tiers
+
+
+def read_products(path):
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            return list(csv.DictReader(f))
+    with open(path) as f:
+        data = json.load(f)
+    return data['products'] if isinstance(data, dict) else data
+
+
+class _Tables:
+    # One compiled catalog. The price tables are never modified once built,
+    # so readers use them without locks while a reload builds the next one.
+    def __init__(self, products):
+        n = len(products)
+        tiers = [_parse_tiers(p.get('tiers')) for p in products]
+        depth = 1 + max((len(t) for t in tiers), default=0)
+        self.labels = [p['label'] for p in products]
+        self.ids = {}
+        for i, label in enumerate(self.labels):
+            if label in self.ids:
+                raise ValueError(f"catalog: duplicate label {label!r}")
+            self.ids[label] = i
+        self.products = products
+        self.base_price = np.zeros(n)
+        self.discount = np.zeros(n)
+        self.promo_start = np.full(n, -np.inf)
+        self.promo_end = np.full(n, np.inf)
+        # tier_from[i, k] is the weight from which tier_rate[i, k] applies;
+        # unused tiers start at infinity so they never match.
+        self.tier_from = np.full((n, depth), np.inf)
+        self.tier_rate = np.zeros((n, depth))
+        for i, product in enumerate(products):
+            self.base_price[i] = float(product.get('base_price') or 0)
+            self.discount[i] = float(product.get('discount') or 0)
+            self.promo_start[i] = _timestamp(product.get('promo_start'), -np.inf)
+            self.promo_end[i] = _timestamp(product.get('promo_end'), np.inf)
+            self.tier_from[i, 0] = 0.0
+            self.tier_rate[i, 0] = float(product.get('rate') or 0)
+            for k, (from_g, rate) in enumerate(sorted(tiers[i]), start=1):
+                self.tier_from[i, k] = from_g
+                self.tier_rate[i, k] = rate
+        # Plain Python copies of the same rules for pricing one item, where
+        # numpy's per-call overhead would dominate.
+        self.rules = [(float(self.base_price[i]), float(self.discount[i]),
+                       float(self.promo_start[i]), float(self.promo_end[i]),
+                       [(0.0, float(self.tier_rate[i, 0]))] + sorted(tiers[i]))
+                      for i in range(n)]
+        self.model_labels = []
+        self.model_ids_list = []
+        self.model_ids = np.zeros(0, dtype=np.intp)
+
+    def bind(self, labels):
+        self.model_labels = list(labels)
+        self.model_ids_list = [self.ids.get(label, UNKNOWN) for label in labels]
+        self.model_ids = np.array(self.model_ids_list, dtype=np.intp)
+        return [label for label in labels if label not in self.ids]
+
+    def price_one(self, i, weight, now):
+        base, discount, start, end, tiers = self.rules[i]
+        rate = 0.0
+        for from_g, tier_rate in tiers:
+            if weight < from_g:
+                break
+            rate = tier_rate
+        price = base + weight * rate
+        if discount and start <= now < end:
+            price *= 1.0 - discount
+        return price
+
+    def price(self, ids, weights, now):
+        tier = (self.tier_from[ids] <= weights[:, None]).sum(axis=1) - 1
+        rate = self.tier_rate[ids, tier]
+        price = self.base_price[ids] + weights * rate
+        active = (self.promo_start[ids] <= now) & (now < self.promo_end[ids])
+        return price * (1.0 - np.where(active, self.discount[ids], 0.0))
+
+
+class Catalog:
+    def __init__(self, path=None, products=None):
+        self.path = path
+        self._mtime = None
+        self._model_labels = None
+        self._watcher = None
+        self._stop = threading.Event()
+        if products is not None:
+            self._tables = _Tables(list(products))
+        else:
+            self._tables = _Tables([])
+            self.load()
+
+    def load(self):
+        self._mtime = os.stat(self.path).st_mtime
+        tables = _Tables(read_products(self.path))
+        if self._model_labels is not None:
+            self._warn_missing(tables.bind(self._model_labels))
+        # Bound before the swap so readers never see new tables with the
+        # old label mapping.
+        self._tables = tables
+        logger.info(f"Catalog: {len(tables.labels)} products from {self.path}")
+
+    def __len__(self):
+        return len(self._tables.labels)
+
+    def __contains__(self, label):
+        return label in self._tables.ids
+
+    # Precompute model label index -> product id (from model_parameters
+    # labels at runner.init()), so price_cart() can take label indices.
+    def bind_labels(self, labels):
+        self._model_labels = list(labels)
+        missing = self._tables.bind(labels)
+        self._warn_missing(missing)
+        return missing
+
+    def _warn_missing(self, missing):
+        if missing:
+            logger.warning(f"Catalog: no product for model labels {missing}")
+
+    def product_id(self, label):
+        try:
+            return self._tables.ids[label]
+        except KeyError:
+            raise UnknownProductError(label) from None
+
+    def product(self, label):
+        return self._tables.products[self.product_id(label)]
+
+    def price(self, label, weight, now=None):
+        tables = self._tables
+        i = tables.ids.get(label, UNKNOWN)
+        if i == UNKNOWN:
+            raise UnknownProductError(label)
+        return tables.price_one(i, weight, time.time() if now is None else now)
+
+    def price_cart(self, items, weights, now=None):
+        # items: labels, or model label indices after bind_labels().
+        # Returns one price per item; any unknown label raises.
+        tables = self._tables
+        now = time.time() if now is None else now
+        by_index = len(items) > 0 and not isinstance(items[0], str)
+        if len(items) < VECTOR_MIN_ITEMS:
+            if by_index:
+                ids = [tables.model_ids_list[i] for i in items]
+            else:
+                ids = [tables.ids.get(label, UNKNOWN) for label in items]
+            self._check_known(tables, items, ids)
+            price_one = tables.price_one
+            return np.array([price_one(i, w, now) for i, w in zip(ids, weights)], dtype=float)
+        if by_index:
+            ids = tables.model_ids[np.asarray(items, dtype=np.intp)]
+        else:
+            ids = np.array([tables.ids.get(label, UNKNOWN) for label in items], dtype=np.intp)
+        self._check_known(tables, items, ids)
+        return tables.price(ids, np.asarray(weights, dtype=float), now)
+
+    def _check_known(self, tables, items, ids):
+        if UNKNOWN in ids:
+            unknown = [item for item, i in zip(items, ids) if i == UNKNOWN]
+            if not isinstance(unknown[0], str):
+                unknown = [tables.model_labels[i] for i in unknown]
+            raise UnknownProductError(", ".join(dict.fromkeys(unknown)))
+
+    def watch(self, interval=2.0):
+        # Poll the file's mtime and reload on change. A file that fails to
+        # load is logged and the previous catalog stays in use.
+        if self._watcher is not None or self.path is None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                         name='catalog-watch', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                if os.stat(self.path).st_mtime != self._mtime:
+                    self.load()
+            except Exception as e:
+                logger.error(f"Catalog: reload of {self.path} failed: {e}")
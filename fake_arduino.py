@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+"""Pseudo-terminal stand-in for the Arduino load cell sketch.
+
+Opens a pty pair and speaks the sketch's protocol on the master side, so
+SerialHX711 can be pointed at `FakeArduino.port` exactly as at
+/dev/ttyUSB0:
+
+    board = FakeArduino(samples, sps=80).start()
+    hx = SerialHX711(board.port)
+
+`samples` is any iterator of raw values (e.g. sim.SyntheticScale).
+`corrupt_every` and `drop_every` damage or skip every n-th frame to
+exercise resync and drop counting.
+"""
+import os
+import select
+import threading
+import time
+import tty
+
+from serial_hx711 import encode_frame
+
+
+class FakeArduino:
+    def __init__(self, samples, sps=80, samples_b=None, corrupt_every=None, drop_every=None):
+        self.samples = iter(samples)
+        self.samples_b = iter(samples_b) if samples_b is not None else self.samples
+        self.period = 1.0 / sps
+        self.corrupt_every = corrupt_every
+        self.drop_every = drop_every
+        self.gain_code = 1
+        self.powered_down = False
+        self.sent = 0
+        self.seq = 0
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='fake-arduino', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle_commands(self, data):
+        i = 0
+        while i < len(data):
+            command = data[i:i + 1]
+            if command == b'g' and i + 1 < len(data):
+                self.gain_code = data[i + 1]
+                i += 1
+            elif command == b'd':
+                self.powered_down = True
+            elif command == b'u':
+                self.powered_down = False
+            i += 1
+
+    def _run(self):
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            timeout = max(0.0, next_sample - time.monotonic())
+            readable, _, _ = select.select([self._master], [], [], timeout)
+            if readable:
+                self._handle_commands(os.read(self._master, 64))
+                continue
+            next_sample += self.period
+            if self.powered_down:
+                continue
+            value = next(self.samples_b if self.gain_code == 2 else self.samples)
+            frame = bytearray(encode_frame(self.seq, self.gain_code, value))
+            self.seq = (self.seq + 1) & 0xff
+            self.sent += 1
+            if self.drop_every and self.sent % self.drop_every == 0:
+                continue
+            if self.corrupt_every and self.sent % self.corrupt_every == 0:
+                frame[5] ^= 0x10
+            os.write(self._master, bytes(frame))
@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+"""Minimal stand-in for the libgpiod v1 Python bindings.
+
+Emulates the HX711 serial protocol on a pair of lines so hx711.py can run on
+any Linux box. Install it with `fake_gpiod.install()` before importing hx711.
+"""
+import sys
+import time
+
+LINE_REQ_DIR_AS_IS = 1
+LINE_REQ_DIR_IN = 2
+LINE_REQ_DIR_OUT = 3
+LINE_REQ_EV_FALLING_EDGE = 4
+LINE_REQ_EV_RISING_EDGE = 5
+LINE_REQ_EV_BOTH_EDGES = 6
+
+
+class FakeHX711Device:
+    """One HX711: raw 24-bit conversions clocked out MSB first on DOUT.
+
+    Holding PD_SCK high for longer than `power_down_after` seconds powers
+    the chip down like the real part: the read in progress is abandoned and
+    the gain falls back to 128. None disables this. A read left half done
+    for `resync_after` seconds is dropped so a host that lost sync (for
+    example after a spurious power-down) gets a fresh conversion.
+    Conversions selected with 26 pulses (channel B) come from `samples_b`
+    when it is given.
+    """
+
+    def __init__(self, samples, sps=None, power_down_after=60e-6, resync_after=0.01,
+                 samples_b=None):
+        self.samples = iter(samples)
+        self.samples_b = iter(samples_b) if samples_b is not None else self.samples
+        self.period = 1.0 / sps if sps else 0.0
+        self.power_down_after = power_down_after
+        self.resync_after = resync_after
+        self.pulses = 0
+        self.gain_pulses = 1
+        self.sck = 0
+        self.sck_rose = 0.0
+        self.ready_at = 0.0
+        self.polled = False
+        self.power_downs = 0
+        self.current = next(self.samples) & 0xffffff
+
+    def _next_sample(self):
+        source = self.samples_b if self.gain_pulses == 2 else self.samples
+        return next(source) & 0xffffff
+
+    def dout(self):
+        if self.pulses == 0:
+            return 0 if time.monotonic() >= self.ready_at else 1
+        if self.pulses <= 24:
+            if time.monotonic() - self.sck_rose > self.resync_after:
+                self.pulses = 0
+                self.current = self._next_sample()
+                return 0
+            return (self.current >> (24 - self.pulses)) & 1
+        # Trailing gain pulses are told apart from the next ready poll by
+        # two DOUT reads in a row with no clock pulse in between.
+        polled, self.polled = self.polled, True
+        if polled and time.monotonic() >= self.ready_at:
+            self.polled = False
+            self.gain_pulses = self.pulses - 24
+            self.pulses = 0
+            self.current = self._next_sample()
+            return 0
+        return 1
+
+    def ready_in(self):
+        if 0 < self.pulses <= 24:
+            return max(0.0, self.sck_rose + self.resync_after - time.monotonic())
+        return max(0.0, self.ready_at - time.monotonic())
+
+    def clock(self, value):
+        if value and not self.sck:
+            self.sck_rose = time.monotonic()
+            if self.pulses or self.dout() == 0:
+                self.pulses += 1
+                self.polled = False
+                if self.pulses == 24:
+                    self.ready_at = time.monotonic() + self.period
+        elif not value and self.sck and self.power_down_after is not None:
+            now = time.monotonic()
+            if now - self.sck_rose > self.power_down_after:
+                self.power_downs += 1
+                self.pulses = 0
+                self.gain_pulses = 1
+                self.polled = False
+                self.ready_at = now + self.period
+                self.current = self._next_sample()
+        self.sck = value
+
+
+class Line:
+    def __init__(self, chip, offset):
+        self.chip = chip
+        self.offset = offset
+        self.device = None
+        self.consumer = None
+        self.type = None
+
+    def request(self, consumer=None, type=LINE_REQ_DIR_AS_IS, flags=0, default_val=0):
+        self.consumer = consumer
+        self.type = type
+
+    def release(self):
+        self.consumer = None
+
+    # attach_hx711() rebinds these straight to the device so the fake adds
+    # as little per-call overhead as possible to what is being measured.
+    def set_value(self, value):
+        pass
+
+    def get_value(self):
+        return 0
+
+    def read(self):
+        return self.get_value()
+
+    def event_wait(self, sec=1, nsec=0):
+        timeout = sec + nsec / 1e9
+        wait = self.device.ready_in()
+        if wait > timeout:
+            time.sleep(timeout)
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def event_read_multiple(self):
+        return []
+
+
+class LineBulk:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def request(self, consumer=None, type=LINE_REQ_DIR_AS_IS, flags=0, default_vals=None):
+        for line in self.lines:
+            line.request(consumer=consumer, type=type, flags=flags)
+
+    def release(self):
+        for line in self.lines:
+            line.release()
+
+    def get_values(self):
+        # One call for all lines, like the single ioctl behind the real one.
+        delay = self.lines[0].chip.io_delay if self.lines else 0
+        if delay:
+            _spin(delay)
+        return [line.read() for line in self.lines]
+
+    def set_values(self, values):
+        for line, value in zip(self.lines, values):
+            line.set_value(value)
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _with_delay(call, delay):
+    if not delay:
+        return call
+
+    def delayed(*args):
+        _spin(delay)
+        return call(*args)
+    return delayed
+
+
+_chip_lines = {}
+
+
+class Chip:
+    OPEN_BY_NUMBER = 3
+
+    # Chips opened by the same name share their lines, so a device attached
+    # by a test is seen by code that opens Chip("0") itself. io_delay adds a
+    # busy wait to every line call to stand in for the cost of the ioctl a
+    # real gpiod call makes; 0 measures Python overhead only.
+    def __init__(self, name="0", how=None, io_delay=0.0):
+        self.name = name
+        self.io_delay = io_delay
+        self.lines = _chip_lines.setdefault(name, {})
+
+    def get_line(self, offset):
+        if offset not in self.lines:
+            self.lines[offset] = Line(self, offset)
+        return self.lines[offset]
+
+    def get_lines(self, offsets):
+        return LineBulk([self.get_line(offset) for offset in offsets])
+
+    def attach_hx711(self, device, dout, sck):
+        dout_line = self.get_line(dout)
+        dout_line.device = device
+        dout_line.read = device.dout
+        dout_line.get_value = _with_delay(device.dout, self.io_delay)
+        sck_line = self.get_line(sck)
+        devices = sck_line.devices = getattr(sck_line, 'devices', []) + [device]
+        if len(devices) == 1:
+            clock = device.clock
+        else:
+            def clock(value):
+                for shared in devices:
+                    shared.clock(value)
+        sck_line.set_value = _with_delay(clock, self.io_delay)
+        return device
+
+    def close(self):
+        pass
+
+
+def reset():
+    _chip_lines.clear()
+
+
+def install():
+    sys.modules['gpiod'] = sys.modules[__name__]
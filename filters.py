@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+"""Streaming filters for HX711 samples.
+
+Each filter is fed one raw value at a time with add() and can be queried
+with value() at any moment, so a stable reading is available as soon as
+enough samples exist instead of after a fresh batch of conversions.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+
+
+class SlidingWindow:
+    """Last `window` samples kept both in arrival order and sorted.
+
+    The sorted copy is located with bisect, so each add() is O(log n)
+    comparisons plus one memmove for the insert and one for the evict.
+    """
+
+    def __init__(self, window, min_samples=None):
+        if window <= 0:
+            raise ValueError("SlidingWindow: window must be >= 1")
+        self.window = window
+        self.min_samples = window if min_samples is None else min_samples
+        self._lock = threading.Lock()
+        self._arrival = deque()
+        self._sorted = []
+
+    def add(self, value):
+        with self._lock:
+            if len(self._arrival) == self.window:
+                old = self._arrival.popleft()
+                del self._sorted[bisect_left(self._sorted, old)]
+                self._evicted(old)
+            self._arrival.append(value)
+            insort(self._sorted, value)
+            self._added(value)
+
+    def _added(self, value):
+        pass
+
+    def _evicted(self, value):
+        pass
+
+    def __len__(self):
+        return len(self._arrival)
+
+    def ready(self):
+        return len(self._arrival) >= self.min_samples
+
+    def value(self):
+        with self._lock:
+            if len(self._arrival) < self.min_samples or not self._arrival:
+                return None
+            return self._compute()
+
+    def reset(self):
+        with self._lock:
+            self._arrival.clear()
+            self._sorted.clear()
+            self._cleared()
+
+    def _cleared(self):
+        pass
+
+
+class SlidingMedian(SlidingWindow):
+    """Median of the last `window` samples."""
+
+    def _compute(self):
+        values = self._sorted
+        midpoint = len(values) // 2
+        if len(values) & 0x1:
+            return values[midpoint]
+        return (values[midpoint - 1] + values[midpoint]) / 2.0
+
+
+class TrimmedMean(SlidingWindow):
+    """Mean of the last `window` samples without the top and bottom `trim` fraction.
+
+    Uses the same 20% trim as HX711.read_average() by default. A running sum
+    of the window means only the trimmed tails are summed per query.
+    """
+
+    def __init__(self, window, trim=0.2, min_samples=None):
+        if not 0 <= trim < 0.5:
+            raise ValueError("TrimmedMean: trim must be in [0, 0.5)")
+        super().__init__(window, min_samples)
+        self.trim = trim
+        self._sum = 0
+
+    def _added(self, value):
+        self._sum += value
+
+    def _evicted(self, value):
+        self._sum -= value
+
+    def _cleared(self):
+        self._sum = 0
+
+    def _compute(self):
+        values = self._sorted
+        trimAmount = int(len(values) * self.trim)
+        if trimAmount == 0:
+            return self._sum / len(values)
+        total = self._sum - sum(values[:trimAmount]) - sum(values[-trimAmount:])
+        return total / (len(values) - 2 * trimAmount)
+
+
+class EMAFilter:
+    """Exponential moving average, value = alpha * sample + (1 - alpha) * value."""
+
+    def __init__(self, alpha=0.2, min_samples=1):
+        if not 0 < alpha <= 1:
+            raise ValueError("EMAFilter: alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.count = 0
+        self._value = None
+
+    def add(self, value):
+        if self._value is None:
+            self._value = float(value)
+        else:
+            self._value += self.alpha * (value - self._value)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def ready(self):
+        return self.count >= self.min_samples
+
+    def value(self):
+        return self._value if self.ready() else None
+
+    def reset(self):
+        self.count = 0
+        self._value = None
+
+
+class KalmanFilter:
+    """One-dimensional Kalman filter for a constant weight.
+
+    `process_variance` is how much the true load is expected to move between
+    samples and `measurement_variance` is the HX711 noise, both in raw
+    counts squared.
+    """
+
+    def __init__(self, process_variance=1.0, measurement_variance=400.0, min_samples=1):
+        self.process_variance = process_variance
+        self.measurement_variance = measurement_variance
+        self.min_samples = min_samples
+        self.count = 0
+        self._value = None
+        self._error = 0.0
+
+    def add(self, value):
+        if self._value is None:
+            self._value = float(value)
+            self._error = self.measurement_variance
+        else:
+            error = self._error + self.process_variance
+            gain = error / (error + self.measurement_variance)
+            self._value += gain * (value - self._value)
+            self._error = (1 - gain) * error
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def ready(self):
+        return self.count >= self.min_samples
+
+    def value(self):
+        return self._value if self.ready() else None
+
+    def reset(self):
+        self.count = 0
+        self._value = None
+        self._error = 0.0
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""Reuse classifier results for near-identical frames.
+
+While a product sits still on the scale consecutive frames barely change.
+InferenceCache keeps a cheap fingerprint of the frame behind the last real
+inference and hands back that result for frames within `threshold` of it
+and younger than `max_age` seconds. Anything else runs the model again.
+
+Two fingerprints are available:
+  'diff'  - grayscale thumbnail, distance is the mean absolute pixel
+            difference (0-255)
+  'dhash' - 64-bit difference hash, distance is the Hamming distance (0-64)
+"""
+import time
+
+import cv2
+import numpy as np
+
+DIFF = 'diff'
+DHASH = 'dhash'
+
+
+class InferenceCache:
+    def __init__(self, threshold=4.0, max_age=1.0, method=DIFF, size=16):
+        if method not in (DIFF, DHASH):
+            raise ValueError(f"InferenceCache: unknown method {method!r}")
+        self.threshold = threshold
+        self.max_age = max_age
+        self.method = method
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._fingerprint = None
+        self._result = None
+        self._stored_at = 0.0
+
+    def fingerprint(self, img):
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        if self.method == DHASH:
+            small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+            return small[:, 1:] > small[:, :-1]
+        small = cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        return small.astype(np.int16)
+
+    def distance(self, a, b):
+        if self.method == DHASH:
+            return int(np.count_nonzero(a != b))
+        return float(np.abs(a - b).mean())
+
+    def lookup(self, fingerprint, now=None):
+        if self._fingerprint is None:
+            return None
+        now = time.monotonic() if now is None else now
+        if now - self._stored_at > self.max_age:
+            return None
+        if self.distance(fingerprint, self._fingerprint) > self.threshold:
+            return None
+        return self._result
+
+    def store(self, fingerprint, result, now=None):
+        self._fingerprint = fingerprint
+        self._result = result
+        self._stored_at = time.monotonic() if now is None else now
+
+    def invalidate(self):
+        self._fingerprint = None
+        self._result = None
+
+    def classify(self, img, infer):
+        # infer(img) runs the model; it is skipped when the cache hits.
+        fingerprint = self.fingerprint(img)
+        result = self.lookup(fingerprint)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = infer(img)
+        self.store(fingerprint, result)
+        return result
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
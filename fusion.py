@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+"""Vision and weight fusion for deciding which product is on the scale.
+
+Instead of waiting for one frame the model is sure about, every frame's
+scores and the settled weight step are combined into a posterior over the
+model's labels:
+
+    log P(label) = log prior + frame_weight * sum(log frame score)
+                   + log N(weight; mean_label, std_label)
+
+Frames of the same item are strongly correlated, so each counts for
+`frame_weight` of an independent observation. WeightModel supplies each
+product's expected weight, from the catalog's weight_g / weight_std_g
+fields or learned from earlier decisions. FusionDecider decides as soon as
+one label's posterior reaches `threshold`, which for distinct products is
+usually on the first frame after the scale settles. A step that never
+gets there is billed as its best label, flagged low_confidence.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+from logzero import logger
+
+from scale_events import ITEM_ADDED
+
+Decision = namedtuple('Decision', ['label', 'posterior', 'weight_g', 'frames', 'timestamp', 'low_confidence'],
+                      defaults=(False,))
+
+# Density for a product with no weight information: uniform over 2 kg, so
+# weight neither favours nor rules it out against similar unknowns.
+UNKNOWN_WEIGHT_DENSITY = 1.0 / 2000.0
+
+
+class WeightModel:
+    """Expected weight per label, as (mean g, standard deviation g).
+
+    observe() keeps a running mean and variance per label; once a label has
+    `min_count` observations they replace the catalog's figures. Counts are
+    capped at `max_count` so the estimate keeps following a product whose
+    packaging changes.
+    """
+
+    def __init__(self, catalog=None, min_count=5, max_count=50, min_std_g=2.0, relative_std=0.02):
+        self.catalog = catalog
+        self.min_count = min_count
+        self.max_count = max_count
+        self.min_std_g = min_std_g
+        self.relative_std = relative_std
+        self._learned = {}  # label -> [count, mean, M2]
+        self._lock = threading.Lock()
+
+    def expected(self, label):
+        # (mean, std) or None when nothing is known about the label.
+        with self._lock:
+            stats = self._learned.get(label)
+        if stats is not None and stats[0] >= self.min_count:
+            count, mean, m2 = stats
+            return mean, math.sqrt(m2 / (count - 1))
+        if self.catalog is not None and label in self.catalog:
+            product = self.catalog.product(label)
+            if product.get('weight_g') not in (None, ''):
+                return float(product['weight_g']), float(product.get('weight_std_g') or 0)
+        return None
+
+    def density(self, label, weight_g):
+        expected = self.expected(label)
+        if expected is None:
+            return UNKNOWN_WEIGHT_DENSITY
+        mean, std = expected
+        # Floor the spread at the scale's own error so a product that always
+        # weighs the same is not ruled out by a gram of noise.
+        std = max(std, self.min_std_g, self.relative_std * mean)
+        z = (weight_g - mean) / std
+        return math.exp(-0.5 * z * z) / (std * math.sqrt(2 * math.pi))
+
+    def observe(self, label, weight_g):
+        # Welford's update, with the count capped.
+        with self._lock:
+            count, mean, m2 = self._learned.get(label, (0, 0.0, 0.0))
+            if count >= self.max_count:
+                m2 *= (count - 1) / count
+                count -= 1
+            count += 1
+            delta = weight_g - mean
+            mean += delta / count
+            m2 += delta * (weight_g - mean)
+            self._learned[label] = [count, mean, m2]
+
+    def save(self, path):
+        with self._lock:
+            data = {label: {'count': count, 'mean': mean, 'm2': m2}
+                    for label, (count, mean, m2) in self._learned.items()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        with self._lock:
+            self._learned = {label: [int(s['count']), float(s['mean']), float(s['m2'])]
+                             for label, s in data.items()}
+
+
+class FusionDecider:
+    """Decides on the item behind each weight step from the frames around it.
+
+    Feed it every classifier result with add_frame() and subscribe it to
+    the ScaleEventStream; decide() then returns a Decision once a settled
+    weight step and the frames since the item was placed agree on a label,
+    or None. A step still undecided after `timeout` seconds is decided for
+    its best label anyway, with low_confidence set, as long as some frame
+    showed a product; otherwise it is dropped.
+    Scores under `min_score` are ignored, and labels a frame does not
+    mention get `floor`, so one frame can never rule a label out.
+    """
+
+    def __init__(self, labels, weights, threshold=0.9, frame_weight=0.5, min_score=0.1,
+                 floor=0.05, lookback=2.0, timeout=3.0, max_frames=64, prior=None):
+        self.labels = list(labels)
+        self.weights = weights
+        self.threshold = threshold
+        self.frame_weight = frame_weight
+        self.min_score = min_score
+        self.floor = floor
+        self.lookback = lookback
+        self.timeout = timeout
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        if prior is None:
+            self._log_prior = np.full(len(self.labels), -math.log(len(self.labels)))
+        else:
+            p = np.array([prior.get(label, 0.0) for label in self.labels], dtype=float)
+            self._log_prior = np.log(np.maximum(p / p.sum(), 1e-9))
+        self._frames = deque(maxlen=max_frames)  # (timestamp, log scores)
+        self._steps = deque()  # (weight_g, timestamp) of undecided weight steps
+        self._since = 0.0
+        self._lock = threading.Lock()
+        self.decided = 0
+        self.low_confidence = 0
+        self.undecided = 0
+
+    # ScaleEventStream.subscribe() callback; runs on the sampler thread.
+    def on_scale_event(self, event):
+        if event.kind == ITEM_ADDED:
+            with self._lock:
+                self._steps.append((event.delta_g, event.timestamp))
+
+    def pending(self):
+        # True while a weight step waits for a decision.
+        with self._lock:
+            return bool(self._steps)
+
+    def frame_scores(self, result):
+        # Log scores per label for one classifier result (bounding boxes
+        # or classification), or None when it shows no product.
+        scores = np.full(len(self.labels), self.floor)
+        seen = False
+        if 'bounding_boxes' in result:
+            pairs = ((box['label'], box['value']) for box in result['bounding_boxes'])
+        else:
+            pairs = result.get('classification', {}).items()
+        for label, score in pairs:
+            i = self._index.get(label)
+            if i is not None and score >= self.min_score:
+                scores[i] = max(scores[i], score)
+                seen = True
+        if not seen:
+            return None
+        return np.log(scores / scores.sum())
+
+    def add_frame(self, result, timestamp=None):
+        scores = self.frame_scores(result)
+        if scores is not None:
+            with self._lock:
+                self._frames.append((time.monotonic() if timestamp is None else timestamp, scores))
+
+    def posterior(self, weight_g, since):
+        # Posterior over labels from the frames after `since` and the weight.
+        with self._lock:
+            frames = [scores for t, scores in self._frames if t >= since]
+        log_p = self._log_prior.copy()
+        for scores in frames:
+            log_p += self.frame_weight * scores
+        log_p += np.log([max(self.weights.density(label, weight_g), 1e-300) for label in self.labels])
+        log_p -= log_p.max()
+        p = np.exp(log_p)
+        return p / p.sum(), len(frames)
+
+    def decide(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self._steps:
+                return None
+            weight_g, settled_at = self._steps[0]
+        since = max(settled_at - self.lookback, self._since)
+        posterior, frames = self.posterior(weight_g, since)
+        best = int(posterior.argmax())
+        if frames and posterior[best] >= self.threshold:
+            with self._lock:
+                self._steps.popleft()
+                self._since = now
+            self.decided += 1
+            self.weights.observe(self.labels[best], weight_g)
+            return Decision(self.labels[best], float(posterior[best]), weight_g, frames, now)
+        if now - settled_at > self.timeout:
+            with self._lock:
+                self._steps.popleft()
+                if frames:
+                    self._since = now
+            if frames:
+                # Billing the likeliest label beats losing the item; weights
+                # learn only from confident decisions.
+                self.low_confidence += 1
+                logger.warning("Fusion: %.1fg undecided after %d frames, taking %s at %.2f",
+                               weight_g, frames, self.labels[best], posterior[best])
+                return Decision(self.labels[best], float(posterior[best]), weight_g, frames, now, True)
+            self.undecided += 1
+            logger.warning("Fusion: no product seen for %.1fg", weight_g)
+        return None
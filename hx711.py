@@ -1,8 +1,10 @@
 #!/usr/bin/python3
-import gpiod
+import json
+import os
 import time
 import threading
 from logzero import logger
+import metrics
 
 DEFAULT_LINE_MAP = {
    'JETSON_NANO': {
@@ -15,6 +17,104 @@ DEFAULT_LINE_MAP = {
 }
 
 DEFAULT_GPIOD_CONSUMER = 'hx711'
+DEFAULT_BUFFER_SIZE = 64
+SAMPLE_POLL_INTERVAL = 0.005
+DEFAULT_READY_TIMEOUT = 1.0
+DEFAULT_READY_POLL_INTERVAL = 0.001
+DEFAULT_MAX_DRIFT = 5.0  # grams a stored tare may be off before a full tare is needed
+
+class HX711TimeoutError(TimeoutError):
+   pass
+
+class HX711UnsupportedError(NotImplementedError):
+   # Raised by a backend for an operation it cannot do, e.g. bit-level
+   # reads on SerialHX711, which only receives decoded conversions.
+   pass
+
+class _SampleRing:
+   # Fixed-size ring of (timestamp, value). Only the sampler thread pushes;
+   # readers take a snapshot of count and copy the slots behind it. start
+   # marks the first sample taken at the current gain.
+   def __init__(self, size):
+       self.size = size
+       self.values = [0] * size
+       self.times = [0.0] * size
+       self.count = 0
+       self.start = 0
+
+   def push(self, value, timestamp):
+       index = self.count % self.size
+       self.values[index] = value
+       self.times[index] = timestamp
+       self.count += 1
+
+   def restart(self):
+       self.start = self.count
+
+   def available(self):
+       return min(self.count - self.start, self.size)
+
+   def latest(self, times):
+       # The latest `times` samples, oldest first, or None if there are not
+       # enough yet or the writer lapped them while they were copied.
+       end = self.count
+       if end - self.start < times:
+           return None
+       samples = []
+       for i in range(end - times, end):
+           index = i % self.size
+           samples.append((self.times[index], self.values[index]))
+       if self.count - (end - times) > self.size:
+           return None
+       return samples
+
+_REVERSED_BITS = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+def _make_reader(sck_line, dout_line, gain_pulses, byte_format, bit_format):
+   # Build a reader that clocks out one conversion (24 data bits plus the
+   # gain pulses) and returns it as a signed int. Lines and loop ranges are
+   # bound as locals and the format is resolved here, once, not per bit.
+   set_sck = sck_line.set_value
+   get_dout = dout_line.get_value
+   data_bits = range(24)
+   gain_bits = range(gain_pulses)
+
+   def read_msb():
+       value = 0
+       for _ in data_bits:
+           set_sck(1)
+           set_sck(0)
+           value = (value << 1) | get_dout()
+       for _ in gain_bits:
+           set_sck(1)
+           set_sck(0)
+       return value - ((value & 0x800000) << 1)
+
+   if byte_format == 'MSB' and bit_format == 'MSB':
+       return read_msb
+
+   reverse_bits = _REVERSED_BITS
+   swap_bytes = byte_format == 'LSB'
+   flip_bits = bit_format == 'LSB'
+
+   def read_reordered():
+       value = 0
+       for _ in data_bits:
+           set_sck(1)
+           set_sck(0)
+           value = (value << 1) | get_dout()
+       for _ in gain_bits:
+           set_sck(1)
+           set_sck(0)
+       first, second, third = value >> 16, (value >> 8) & 0xff, value & 0xff
+       if flip_bits:
+           first, second, third = reverse_bits[first], reverse_bits[second], reverse_bits[third]
+       if swap_bytes:
+           first, third = third, first
+       value = (first << 16) | (second << 8) | third
+       return value - ((value & 0x800000) << 1)
+
+   return read_reordered
 
 class HX711:
    def get_line_no(self, pin_no):
@@ -29,7 +129,9 @@ class HX711:
        return address_num * 8 + offset
 
    def __init__(self, dout, pd_sck, gain=128, mutex=False, chip=None,
-                line_map_name='JETSON_NANO', custome_line_map=None):
+                line_map_name='JETSON_NANO', custome_line_map=None,
+                buffer_size=DEFAULT_BUFFER_SIZE, ready_timeout=DEFAULT_READY_TIMEOUT,
+                use_events=True, ready_poll_interval=DEFAULT_READY_POLL_INTERVAL):
        self.line_map = None
        if line_map_name in DEFAULT_LINE_MAP:
            self.line_map = DEFAULT_LINE_MAP[line_map_name]
@@ -38,6 +140,9 @@ class HX711:
        else:
            raise RuntimeError(f"line_map_name={line_map_name} not found")
 
+       # Imported here rather than at the top so that SerialHX711, which
+       # shares this class, loads on hosts without libgpiod.
+       import gpiod
        self.chip = chip
        if self.chip is None:
            self.chip = gpiod.Chip("0", gpiod.Chip.OPEN_BY_NUMBER)
@@ -45,14 +150,35 @@ class HX711:
        self.DOUT = self.chip.get_line(self.get_line_no(dout))
        self.mutex_flag = mutex
        if self.mutex_flag:
-           self.readLock = threading.Lock()
+           self.readLock = threading.RLock()
        
        self.PD_SCK.request(consumer=DEFAULT_GPIOD_CONSUMER, type=gpiod.LINE_REQ_DIR_OUT)
-       self.DOUT.request(consumer=DEFAULT_GPIOD_CONSUMER, type=gpiod.LINE_REQ_DIR_IN)
-       
+       self.ready_timeout = ready_timeout
+       self.ready_poll_interval = ready_poll_interval
+       self.use_events = False
+       if use_events:
+           # Falling edge on DOUT means a conversion is ready; waiting on the
+           # event keeps the CPU idle between conversions.
+           try:
+               self.DOUT.request(consumer=DEFAULT_GPIOD_CONSUMER, type=gpiod.LINE_REQ_EV_FALLING_EDGE)
+               self.use_events = True
+           except OSError as e:
+               logger.warning(f"HX711: edge events unavailable on DOUT ({e}), polling instead")
+       if not self.use_events:
+           self.DOUT.request(consumer=DEFAULT_GPIOD_CONSUMER, type=gpiod.LINE_REQ_DIR_IN)
+
+       self._init_state(buffer_size)
+       self.set_gain(gain)
+       time.sleep(0.1)
+
+   def _init_state(self, buffer_size):
+       # Calibration, ring buffer and filter state shared with SerialHX711.
        self.GAIN = 0
        self.REFERENCE_UNIT = 1
        self.REFERENCE_UNIT_B = 1
+       # grams per count squared on channel A, fitted by calibration.py;
+       # 0 keeps the plain linear conversion.
+       self.NONLINEARITY = 0.0
        self.OFFSET = 1.0
        self.OFFSET_B = 1.0
        self.lastVal = 0.0
@@ -60,8 +186,21 @@ class HX711:
        self.byte_format = 'MSB'
        self.bit_format = 'MSB'
 
-       self.set_gain(gain)
-       time.sleep(0.1)
+       # Ring buffers for the streaming mode, one per channel. Channel B's
+       # is only written while interleave_channels() is in effect.
+       self.buffer_size = buffer_size
+       self._ring = _SampleRing(buffer_size)
+       self._ring_b = _SampleRing(buffer_size)
+       self._sampler = None
+       self._sampler_stop = threading.Event()
+       self._filters = []
+       self._filters_b = []
+       # Gain codes of the conversions to come, cycled; None reads every
+       # conversion at self.GAIN.
+       self._schedule = None
+       self._schedule_pos = 0
+       self._schedule_discard = None
+       self.lastChannel = 'A'
 
    def convertFromTwosComplement24bit(self, inputValue):
        return -(inputValue & 0x800000) + (inputValue & 0x7fffff)
@@ -69,15 +208,48 @@ class HX711:
    def is_ready(self):
        return self.DOUT.get_value() == 0
 
+   def wait_ready(self, timeout=None):
+       if self.is_ready():
+           return
+       if timeout is None:
+           timeout = self.ready_timeout
+       deadline = None if timeout is None else time.monotonic() + timeout
+       while True:
+           remaining = 1.0 if deadline is None else deadline - time.monotonic()
+           if remaining <= 0:
+               raise HX711TimeoutError(f"HX711: DOUT not ready after {timeout}s, is the chip connected?")
+           if self.use_events:
+               # Edges from clocking out the previous sample are still queued,
+               # so an event only means "check again".
+               if self.DOUT.event_wait(sec=int(remaining), nsec=int(remaining % 1 * 1e9)):
+                   self.DOUT.event_read_multiple()
+           else:
+               time.sleep(min(self.ready_poll_interval, remaining))
+           if self.is_ready():
+               return
+
    def set_gain(self, gain):
+       if self._schedule is not None:
+           raise RuntimeError("HX711::set_gain(): call stop_interleaving() first")
        if gain == 128:
            self.GAIN = 1
        elif gain == 64:
            self.GAIN = 3
        elif gain == 32:
            self.GAIN = 2
-       self.PD_SCK.set_value(0)
-       self.readRawBytes()
+       if self.mutex_flag:
+           self.readLock.acquire()
+       try:
+           self._select_reader()
+           self.PD_SCK.set_value(0)
+           self._read_conversion()
+           # Samples already in the ring were taken at the previous gain.
+           self._ring.restart()
+           for sample_filter in self._filters:
+               sample_filter.reset()
+       finally:
+           if self.mutex_flag:
+               self.readLock.release()
 
    def get_gain(self):
        if self.GAIN == 1: return 128
@@ -85,6 +257,66 @@ class HX711:
        if self.GAIN == 2: return 32
        return 0
 
+   def _select_reader(self):
+       # One reader per gain code: a reader's trailing pulses pick the gain
+       # and channel of the *next* conversion.
+       self._readers = {code: _make_reader(self.PD_SCK, self.DOUT, code,
+                                           self.byte_format, self.bit_format)
+                        for code in (1, 2, 3)}
+       self._reader = self._readers[self.GAIN or 1]
+
+   # Interleave channel A (at its current gain, 128 or 64) and channel B
+   # (gain 32): `a` conversions of A then `b` of B, repeating. Each read
+   # ends with the pulses for the following conversion's channel, so no
+   # conversion is thrown away on a switch, and samples land in separate
+   # per-channel rings (get_samples(channel='B')) and filters. Starts the
+   # sampler. The datasheet quotes an output settling time after a channel
+   # change; `discard` drops that many conversions after each switch for
+   # load cells that need it.
+   def interleave_channels(self, a=1, b=1, discard=0):
+       if a < 1 or b < 1:
+           raise ValueError("HX711::interleave_channels(): a and b must be >= 1")
+       if discard >= min(a, b):
+           raise ValueError("HX711::interleave_channels(): discard must be less than a and b")
+       self.start_sampling()
+       with self.readLock:
+           gain_a = self.GAIN if self.GAIN in (1, 3) else 1
+           if self._schedule is not None:
+               # The pending conversion was selected by the old schedule.
+               pending = self._schedule[self._schedule_pos]
+           else:
+               pending = self.GAIN
+           schedule = [gain_a] * a + [2] * b
+           self._schedule_discard = [i < discard for i in range(a)] + [i < discard for i in range(b)]
+           if pending in schedule:
+               self._schedule_pos = schedule.index(pending)
+           else:
+               # Selected at a gain not in the schedule; read and drop it.
+               self.wait_ready()
+               self._readers[schedule[0]]()
+               self._schedule_pos = 0
+           self._schedule = schedule
+           self.GAIN = gain_a
+           self._reader = self._readers[gain_a]
+           self._ring_b.restart()
+           for sample_filter in self._filters_b:
+               sample_filter.reset()
+
+   def stop_interleaving(self):
+       with self.readLock:
+           if self._schedule is None:
+               return
+           pending = self._schedule[self._schedule_pos]
+           self._schedule = None
+           if pending != self.GAIN:
+               # The next conversion is on channel B; clock it out with the
+               # pulses that switch back to channel A.
+               self.wait_ready()
+               self._readers[self.GAIN]()
+
+   def is_interleaving(self):
+       return self._schedule is not None
+
    def readNextBit(self):
        self.PD_SCK.set_value(1)
        self.PD_SCK.set_value(0)
@@ -104,19 +336,18 @@ class HX711:
    def readRawBytes(self):
        if self.mutex_flag:
            self.readLock.acquire()
+       try:
+           self.wait_ready()
 
-       while not self.is_ready():
-           pass
-
-       firstByte = self.readNextByte()
-       secondByte = self.readNextByte()
-       thirdByte = self.readNextByte()
+           firstByte = self.readNextByte()
+           secondByte = self.readNextByte()
+           thirdByte = self.readNextByte()
 
-       for i in range(self.GAIN):
-           self.readNextBit()
-
-       if self.mutex_flag:
-           self.readLock.release()          
+           for i in range(self.GAIN):
+               self.readNextBit()
+       finally:
+           if self.mutex_flag:
+               self.readLock.release()
 
        if self.byte_format == 'LSB':
            return [thirdByte, secondByte, firstByte]
@@ -124,37 +355,68 @@ class HX711:
            return [firstByte, secondByte, thirdByte]
 
    def read_long(self):
-       dataBytes = self.readRawBytes()
-       logger.debug(dataBytes)
-       twosComplementValue = (dataBytes[0] << 16) + (dataBytes[1] << 8) + dataBytes[2]
-       logger.debug(f"Twos: 0x{twosComplementValue:06x}")
-       signedIntValue = self.convertFromTwosComplement24bit(twosComplementValue)
+       if self._sampler is not None:
+           return self.get_samples(1)[0][1]
+       return self._read_conversion()
+
+   def _read_conversion(self):
+       if self.mutex_flag:
+           self.readLock.acquire()
+       try:
+           schedule = self._schedule
+           while True:
+               if schedule is None:
+                   gain, reader, drop = self.GAIN, self._reader, False
+               else:
+                   pos = self._schedule_pos
+                   gain, drop = schedule[pos], self._schedule_discard[pos]
+                   self._schedule_pos = (pos + 1) % len(schedule)
+                   reader = self._readers[schedule[self._schedule_pos]]
+               if metrics.enabled:
+                   start = time.perf_counter()
+                   self.wait_ready()
+                   ready = time.perf_counter()
+                   signedIntValue = reader()
+                   metrics.observe('hx711_ready_wait_seconds', ready - start)
+                   metrics.observe('hx711_conversion_seconds', time.perf_counter() - ready)
+               else:
+                   self.wait_ready()
+                   signedIntValue = reader()
+               if not drop:
+                   break
+       finally:
+           if self.mutex_flag:
+               self.readLock.release()
+       logger.debug("Twos: 0x%06x", signedIntValue & 0xffffff)
        self.lastVal = signedIntValue
-       return int(signedIntValue)
+       self.lastChannel = 'B' if gain == 2 else 'A'
+       if schedule is not None and gain == 2:
+           filters = self._filters_b
+       else:
+           filters = self._filters
+       for sample_filter in filters:
+           sample_filter.add(signedIntValue)
+       return signedIntValue
 
-   def read_average(self, times=3):
+   def read_average(self, times=3, channel='A'):
        if times <= 0:
            raise ValueError("HX711()::read_average(): times must >= 1!!")
-       if times == 1:
+       if times == 1 and channel == 'A':
            return self.read_long()
        if times < 5:
-           return self.read_median(times)
-       valueList = []
-       for x in range(times):
-           valueList.append(self.read_long())
+           return self.read_median(times, channel)
+       valueList = self._read_values(times, channel)
        valueList.sort()
        trimAmount = int(len(valueList) * 0.2)
        valueList = valueList[trimAmount:-trimAmount]
        return sum(valueList) / len(valueList)
 
-   def read_median(self, times=3):
+   def read_median(self, times=3, channel='A'):
        if times <= 0:
            raise ValueError("HX711::read_median(): times must be greater than zero!")
-       if times == 1:
+       if times == 1 and channel == 'A':
            return self.read_long()
-       valueList = []
-       for x in range(times):
-           valueList.append(self.read_long())
+       valueList = self._read_values(times, channel)
        valueList.sort()
        if (times & 0x1) == 0x1:
            return valueList[len(valueList) // 2]
@@ -162,6 +424,137 @@ class HX711:
            midpoint = len(valueList) // 2
            return sum(valueList[midpoint:midpoint+2]) / 2.0
 
+   def _read_values(self, times, channel='A'):
+       if channel == 'B':
+           if self._schedule is None:
+               raise RuntimeError("HX711: channel B samples need interleave_channels()")
+           return [value for _, value in self.get_samples(times, 'B')]
+       if self._sampler is not None:
+           return [value for _, value in self.get_samples(times)]
+       return [self.read_long() for x in range(times)]
+
+   def start_sampling(self):
+       if self._sampler is not None:
+           return
+       # The sampler shares the clock line with set_gain()/power_down().
+       if not self.mutex_flag:
+           self.readLock = threading.RLock()
+           self.mutex_flag = True
+       self._ring.restart()
+       self._ring_b.restart()
+       self._sampler_stop.clear()
+       self._sampler = threading.Thread(target=self._sampling_loop,
+                                        name='hx711-sampler', daemon=True)
+       self._sampler.start()
+
+   def stop_sampling(self):
+       sampler = self._sampler
+       if sampler is None:
+           return
+       self.stop_interleaving()
+       self._sampler_stop.set()
+       sampler.join()
+       self._sampler = None
+
+   def is_sampling(self):
+       return self._sampler is not None
+
+   def _sampling_loop(self):
+       while not self._sampler_stop.is_set():
+           self.readLock.acquire()
+           try:
+               value = self._read_conversion()
+               if self._schedule is not None and self.lastChannel == 'B':
+                   self._ring_b.push(value, time.monotonic())
+               else:
+                   self._ring.push(value, time.monotonic())
+           except HX711TimeoutError as e:
+               logger.warning("HX711 sampler: %s", e)
+           except Exception as e:
+               logger.error("HX711 sampler: %s", e)
+               self._sampler_stop.wait(0.1)
+           finally:
+               self.readLock.release()
+
+   def samples_available(self, channel='A'):
+       return self._channel_ring(channel).available()
+
+   def _channel_ring(self, channel):
+       if channel == 'A':
+           return self._ring
+       if channel == 'B':
+           return self._ring_b
+       raise ValueError(f"HX711: unknown channel {channel!r}")
+
+   def _conversion_count(self):
+       return self._ring.count + self._ring_b.count
+
+   # Latest `times` (timestamp, raw value) pairs, oldest first. Blocks until
+   # the ring holds that many samples taken at the current gain. Channel B
+   # has samples only while interleave_channels() is in effect.
+   def get_samples(self, times=1, channel='A'):
+       if times > self.buffer_size:
+           raise ValueError(f"HX711::get_samples(): times must be <= buffer_size ({self.buffer_size})")
+       ring = self._channel_ring(channel)
+       last_count = ring.count
+       last_progress = time.monotonic()
+       while True:
+           if self._sampler is None:
+               raise RuntimeError("HX711::get_samples(): sampling is not running")
+           samples = ring.latest(times)
+           if samples is not None:
+               return samples
+           end = ring.count
+           if end - ring.start >= times:
+               # The sampler lapped the slots while we were copying.
+               continue
+           now = time.monotonic()
+           if end != last_count:
+               last_count, last_progress = end, now
+           elif self.ready_timeout is not None and now - last_progress > self.ready_timeout:
+               raise HX711TimeoutError(f"HX711: no new channel {channel} samples for {self.ready_timeout}s")
+           time.sleep(SAMPLE_POLL_INTERVAL)
+
+   # Filters from filters.py are fed every conversion, including those taken
+   # by the sampler thread, and are reset when the gain changes. Channel B
+   # filters are fed while interleave_channels() is in effect.
+   def add_filter(self, sample_filter, channel='A'):
+       filters = self._filters_b if channel == 'B' else self._filters
+       filters.append(sample_filter)
+       return sample_filter
+
+   def remove_filter(self, sample_filter):
+       if sample_filter in self._filters_b:
+           self._filters_b.remove(sample_filter)
+       else:
+           self._filters.remove(sample_filter)
+
+   def read_filtered(self, sample_filter):
+       last_count = self._conversion_count()
+       last_progress = time.monotonic()
+       while not sample_filter.ready():
+           if self._sampler is None:
+               self._read_conversion()
+               continue
+           now = time.monotonic()
+           count = self._conversion_count()
+           if count != last_count:
+               last_count, last_progress = count, now
+           elif self.ready_timeout is not None and now - last_progress > self.ready_timeout:
+               raise HX711TimeoutError(f"HX711: no new samples for {self.ready_timeout}s")
+           time.sleep(SAMPLE_POLL_INTERVAL)
+       return sample_filter.value()
+
+   def get_value_filtered(self, sample_filter):
+       return self.read_filtered(sample_filter) - self.get_offset_A()
+
+   def get_weight_filtered(self, sample_filter):
+       return self.value_to_weight(self.get_value_filtered(sample_filter))
+
+   def value_to_weight(self, value):
+       # Tared channel A counts to grams with the calibration profile.
+       return value / self.REFERENCE_UNIT + self.NONLINEARITY * value * value
+
    def get_value(self, times=3):
        return self.get_value_A(times)
 
@@ -169,19 +562,36 @@ class HX711:
        return self.read_median(times) - self.get_offset_A()
 
    def get_value_B(self, times=3):
-       g = self.get_gain()
-       self.set_gain(32)
-       value = self.read_median(times) - self.get_offset_B()
-       self.set_gain(g)
-       return value
+       if self._schedule is not None:
+           return self.read_median(times, 'B') - self.get_offset_B()
+       return self._read_channel_b(lambda: self.read_median(times)) - self.get_offset_B()
+
+   # Channel B without interleave_channels(): the conversion stream is
+   # switched to gain 32 for `read` and back again. Channel A's filters
+   # (scale events, zero tracking) sit the B samples out, neither fed nor
+   # reset, and channel B's filters get them instead.
+   def _read_channel_b(self, read):
+       backupGain = self.get_gain()
+       filters_a, self._filters = self._filters, []
+       try:
+           self.set_gain(32)
+           for sample_filter in self._filters_b:
+               sample_filter.reset()
+           self._filters = self._filters_b
+           return read()
+       finally:
+           self._filters = []
+           try:
+               self.set_gain(backupGain)
+           finally:
+               self._filters = filters_a
 
    def get_weight(self, times=3):
        return self.get_weight_A(times)
 
    def get_weight_A(self, times=3):
        value = self.get_value_A(times)
-       value = value / self.REFERENCE_UNIT
-       return value
+       return self.value_to_weight(value)
 
    def get_weight_B(self, times=3):
        value = self.get_value_B(times)
@@ -199,11 +609,12 @@ class HX711:
        return value
 
    def tare_B(self, times=15):
-       backupGain = self.get_gain()
-       self.set_gain(32)
-       value = self.read_average(times)
+       if self._schedule is not None:
+           value = self.read_average(times, 'B')
+           self.set_offset_B(value)
+           return value
+       value = self._read_channel_b(lambda: self.read_average(times))
        self.set_offset_B(value)
-       self.set_gain(backupGain)
        return value
 
    def set_reading_format(self, byte_format="LSB", bit_format="MSB"):
@@ -219,6 +630,61 @@ class HX711:
            self.bit_format = bit_format
        else:
            raise ValueError("Unrecognised bitformat: \"%s\"" % bit_format)
+       self._select_reader()
+
+   def save_calibration(self, path):
+       # Written to a temporary file and renamed so a power cut mid-write
+       # leaves the previous calibration in place. Other keys already in the
+       # file (such as calibration.py's fit points) are kept.
+       data = {}
+       try:
+           with open(path) as f:
+               data = json.load(f)
+       except (OSError, ValueError):
+           pass
+       data.update({
+           'gain': self.get_gain(),
+           'offset': self.OFFSET,
+           'offset_b': self.OFFSET_B,
+           'reference_unit': self.REFERENCE_UNIT,
+           'reference_unit_b': self.REFERENCE_UNIT_B,
+           'nonlinearity': self.NONLINEARITY,
+           'saved_at': time.time(),
+       })
+       tmp_path = f"{path}.tmp"
+       with open(tmp_path, 'w') as f:
+           json.dump(data, f, indent=2)
+           f.flush()
+           os.fsync(f.fileno())
+       os.replace(tmp_path, path)
+
+   def load_calibration(self, path, max_drift=DEFAULT_MAX_DRIFT, times=5):
+       # Restore reference units and the last tare from save_calibration().
+       # The stored tare is only kept if a quick read of the empty scale is
+       # within max_drift grams of it; returns False when the caller still
+       # has to tare (no file, other gain, drifted or loaded scale).
+       try:
+           with open(path) as f:
+               data = json.load(f)
+       except FileNotFoundError:
+           return False
+       except (OSError, ValueError) as e:
+           logger.warning(f"HX711: ignoring calibration file {path}: {e}")
+           return False
+       self.REFERENCE_UNIT = data.get('reference_unit', self.REFERENCE_UNIT)
+       self.REFERENCE_UNIT_B = data.get('reference_unit_b', self.REFERENCE_UNIT_B)
+       self.NONLINEARITY = data.get('nonlinearity', 0.0)
+       if data.get('gain') != self.get_gain() or 'offset' not in data:
+           return False
+       self.OFFSET_B = data.get('offset_b', self.OFFSET_B)
+       current = self.read_average(times)
+       drift = abs(self.value_to_weight(current - data['offset']))
+       if drift > max_drift:
+           logger.info(f"HX711: stored tare is {drift:.1f}g off, taring again")
+           return False
+       self.OFFSET = data['offset']
+       logger.debug(f"HX711: stored tare restored ({drift:.1f}g drift)")
+       return True
 
    def set_offset(self, offset):
        self.OFFSET = offset
@@ -273,7 +739,183 @@ class HX711:
        if self.mutex_flag:
            self.readLock.release()
        if self.get_gain() != 128:
-           self.readRawBytes()
+           self._read_conversion()
+
+   def reset(self):
+       self.power_down()
+       self.power_up()
+
+
+class HX711Array:
+   # Several HX711s on one shared PD_SCK line. Every clock pulse reads all
+   # DOUT lines with a single bulk get_values(), so a conversion costs the
+   # same number of GPIO calls however many load cells are attached and all
+   # of them are sampled on the same clock edges. Data is MSB first, the
+   # HX711's native order.
+   get_line_no = HX711.get_line_no
+
+   def __init__(self, douts, pd_sck, gain=128, chip=None,
+                line_map_name='JETSON_NANO', custome_line_map=None,
+                ready_timeout=DEFAULT_READY_TIMEOUT,
+                ready_poll_interval=DEFAULT_READY_POLL_INTERVAL):
+       self.line_map = None
+       if line_map_name in DEFAULT_LINE_MAP:
+           self.line_map = DEFAULT_LINE_MAP[line_map_name]
+       elif custome_line_map:
+           self.line_map = custome_line_map
+       else:
+           raise RuntimeError(f"line_map_name={line_map_name} not found")
+       if not douts:
+           raise ValueError("HX711Array: at least one DOUT pin is required")
+
+       import gpiod
+       self.chip = chip
+       if self.chip is None:
+           self.chip = gpiod.Chip("0", gpiod.Chip.OPEN_BY_NUMBER)
+       self.PD_SCK = self.chip.get_line(self.get_line_no(pd_sck))
+       self.DOUTS = self.chip.get_lines([self.get_line_no(dout) for dout in douts])
+       self.PD_SCK.request(consumer=DEFAULT_GPIOD_CONSUMER, type=gpiod.LINE_REQ_DIR_OUT)
+       self.DOUTS.request(consumer=DEFAULT_GPIOD_CONSUMER, type=gpiod.LINE_REQ_DIR_IN)
+       self.readLock = threading.RLock()
+
+       self.size = len(douts)
+       self.ready_timeout = ready_timeout
+       self.ready_poll_interval = ready_poll_interval
+       self.GAIN = 0
+       self.REFERENCE_UNITS = [1] * self.size
+       self.OFFSETS = [1.0] * self.size
+       self.lastVals = [0] * self.size
+       self.lastTime = 0.0
+
+       self.set_gain(gain)
+       time.sleep(0.1)
+
+   def is_ready(self):
+       return not any(self.DOUTS.get_values())
+
+   def wait_ready(self, timeout=None):
+       # The chips convert on their own oscillators, so wait for the slowest.
+       if timeout is None:
+           timeout = self.ready_timeout
+       deadline = None if timeout is None else time.monotonic() + timeout
+       while not self.is_ready():
+           if deadline is not None and time.monotonic() >= deadline:
+               raise HX711TimeoutError(f"HX711Array: DOUT not ready after {timeout}s, "
+                                       f"lines high: {self.DOUTS.get_values()}")
+           if self.ready_poll_interval:
+               time.sleep(self.ready_poll_interval)
+
+   def set_gain(self, gain):
+       if gain == 128:
+           self.GAIN = 1
+       elif gain == 64:
+           self.GAIN = 3
+       elif gain == 32:
+           self.GAIN = 2
+       with self.readLock:
+           self._reader = self._make_reader()
+           self.PD_SCK.set_value(0)
+           self.read_long()
+
+   def get_gain(self):
+       if self.GAIN == 1: return 128
+       if self.GAIN == 3: return 64
+       if self.GAIN == 2: return 32
+       return 0
+
+   def _make_reader(self):
+       set_sck = self.PD_SCK.set_value
+       get_values = self.DOUTS.get_values
+       data_bits = range(24)
+       gain_bits = range(self.GAIN)
+
+       def read():
+           rows = []
+           for _ in data_bits:
+               set_sck(1)
+               set_sck(0)
+               rows.append(get_values())
+           for _ in gain_bits:
+               set_sck(1)
+               set_sck(0)
+           values = []
+           for column in zip(*rows):
+               value = 0
+               for bit in column:
+                   value = (value << 1) | bit
+               values.append(value - ((value & 0x800000) << 1))
+           return values
+
+       return read
+
+   def read_samples(self):
+       # One synchronized conversion: (timestamp, [raw value per load cell]).
+       with self.readLock:
+           self.wait_ready()
+           timestamp = time.monotonic()
+           values = self._reader()
+       self.lastVals = values
+       self.lastTime = timestamp
+       return timestamp, values
+
+   def read_long(self):
+       return self.read_samples()[1]
+
+   def read_average(self, times=3):
+       if times <= 0:
+           raise ValueError("HX711Array::read_average(): times must >= 1!!")
+       columns = list(zip(*[self.read_long() for x in range(times)]))
+       trimAmount = int(times * 0.2) if times >= 5 else 0
+       averages = []
+       for column in columns:
+           column = sorted(column)
+           if trimAmount:
+               column = column[trimAmount:-trimAmount]
+           averages.append(sum(column) / len(column))
+       return averages
+
+   def get_values(self, times=3):
+       return [value - offset for value, offset in zip(self.read_average(times), self.OFFSETS)]
+
+   def get_weights(self, times=3):
+       return [value / unit for value, unit in zip(self.get_values(times), self.REFERENCE_UNITS)]
+
+   def get_total_weight(self, times=3):
+       return sum(self.get_weights(times))
+
+   def tare(self, times=15):
+       values = self.read_average(times)
+       self.set_offsets(values)
+       return values
+
+   def set_offsets(self, offsets):
+       if len(offsets) != self.size:
+           raise ValueError(f"HX711Array: expected {self.size} offsets, got {len(offsets)}")
+       self.OFFSETS = list(offsets)
+
+   def get_offsets(self):
+       return list(self.OFFSETS)
+
+   def set_reference_units(self, reference_units):
+       if len(reference_units) != self.size:
+           raise ValueError(f"HX711Array: expected {self.size} reference units, got {len(reference_units)}")
+       self.REFERENCE_UNITS = list(reference_units)
+
+   def get_reference_units(self):
+       return list(self.REFERENCE_UNITS)
+
+   def power_down(self):
+       with self.readLock:
+           self.PD_SCK.set_value(0)
+           self.PD_SCK.set_value(1)
+           time.sleep(0.0001)
+
+   def power_up(self):
+       with self.readLock:
+           self.PD_SCK.set_value(0)
+           time.sleep(0.0001)
+           if self.get_gain() != 128:
+               self.read_long()
 
    def reset(self):
        self.power_down()
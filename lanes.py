@@ -0,0 +1,338 @@
+#!/usr/bin/python3
+"""Run several checkout lanes on one host.
+
+A lane is one camera, one scale and one model instance: one copy of
+main.py's detection loop. LaneSupervisor runs every lane in its own worker
+process, so lanes use separate cores and a lane that crashes is restarted
+on its own while the others keep billing. Lanes are described in a JSON
+file:
+
+    {
+      "server_url": "https://vpaygo.onrender.com/api/detections",
+      "outbox_path": "outbox.db",
+      "catalog_path": "catalog.json",
+      "lanes": [
+        {"name": "lane1", "camera_index": 0, "dout_pin": 38, "sck_pin": 40,
+         "model_file": "autobill_fyp-linux-aarch64-v6.eim", "cpus": [0, 1]},
+        {"name": "lane2", "camera_index": 1, "scale_serial_port": "/dev/ttyUSB0",
+         "model_file": "autobill_fyp-linux-aarch64-v6.eim", "cpus": [2, 3]}
+      ]
+    }
+
+Lane keys are main.py settings in lower case (camera_index, dout_pin,
+sck_pin, gpio_chip, scale_serial_port, model_file, calibration_file,
+metrics_port, ...); top-level keys are defaults for every lane. `cpus`
+pins a lane to those cores. Relative paths are taken from the config
+file's directory. Unless set, each lane keeps its own calibration file,
+calibration-<name>.json, and serves metrics on port 9101, 9102, ...
+
+All lanes price from the same catalog file, each watching it for edits,
+and commit detections to one shared outbox. A single upload process
+drains the outbox, so the number of lanes does not change how the server
+is talked to.
+
+    python lanes.py [lanes.json]
+"""
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sys
+import threading
+import time
+
+import logzero
+from logzero import logger
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_CONFIG = os.path.join(HERE, "lanes.json")
+# Settings read by the upload process; they are the same for every lane.
+SHARED_SETTINGS = ('server_url', 'outbox_path', 'outbox_batch_size')
+PATH_SETTINGS = ('model_file', 'calibration_file', 'catalog_path', 'outbox_path', 'recorder_path',
+                 'weight_stats_file')
+# main.py settings a lane may not override, because lanes.py owns them.
+RESERVED_SETTINGS = ('upload_in_process',)
+METRICS_BASE_PORT = 9101  # lane i serves metrics on 9101 + i unless metrics_port is set
+UPLOAD_POLL_INTERVAL = 0.2  # seconds between outbox checks in the upload process
+KILL_WAIT = 5.0  # seconds to wait for a killed worker to exit
+
+
+class Lane:
+    def __init__(self, name, settings=None, cpus=None):
+        # settings: main.py constant name -> value, e.g. {'CAMERA_INDEX': 1}
+        self.name = name
+        self.settings = dict(settings or {})
+        self.cpus = list(cpus) if cpus else None
+
+    def __repr__(self):
+        return f"Lane({self.name!r})"
+
+    def apply(self, module):
+        for name, value in self.settings.items():
+            if not hasattr(module, name):
+                raise ValueError(f"lane {self.name}: unknown setting {name.lower()!r}")
+            setattr(module, name, value)
+
+
+def load_config(path=DEFAULT_CONFIG):
+    # Returns (shared settings, lanes); shared settings use main.py names.
+    with open(path) as f:
+        config = json.load(f)
+    base = os.path.dirname(os.path.realpath(path))
+    defaults = {key: value for key, value in config.items() if key != 'lanes'}
+    lanes = []
+    for i, entry in enumerate(config.get('lanes', [])):
+        entry = dict(defaults, **entry)
+        name = str(entry.pop('name', f"lane{i + 1}"))
+        if name in (lane.name for lane in lanes):
+            raise ValueError(f"lanes: duplicate lane name {name!r}")
+        cpus = entry.pop('cpus', None)
+        entry.setdefault('calibration_file', f"calibration-{name}.json")
+        entry.setdefault('metrics_port', METRICS_BASE_PORT + i)
+        settings = {}
+        for key, value in entry.items():
+            if key in RESERVED_SETTINGS or key in SHARED_SETTINGS and key in config['lanes'][i]:
+                raise ValueError(f"lane {name}: {key!r} cannot be set per lane")
+            if key in PATH_SETTINGS and value:
+                value = os.path.join(base, value)
+            settings[key.upper()] = value
+        lanes.append(Lane(name, settings, cpus))
+    if not lanes:
+        raise ValueError(f"lanes: no lanes in {path}")
+    shared = {key.upper(): os.path.join(base, value) if key in PATH_SETTINGS else value
+              for key, value in defaults.items() if key in SHARED_SETTINGS}
+    return shared, lanes
+
+
+class _LinePrefix:
+    # Tags every line a lane prints with the lane's name, including the
+    # '\r' progress lines.
+    def __init__(self, stream, prefix):
+        self._stream = stream
+        self._prefix = prefix
+        self._line_start = True
+
+    def write(self, text):
+        if not text:
+            return 0
+        tagged = re.sub(r'([\r\n])(?=[^\r\n])', lambda m: m.group(1) + self._prefix, text)
+        if self._line_start and text[0] not in '\r\n':
+            tagged = self._prefix + tagged
+        self._line_start = text[-1] in '\r\n'
+        self._stream.write(tagged)
+        return len(text)
+
+    def flush(self):
+        self._stream.flush()
+
+
+def _on_sigterm(event):
+    # The supervisor stops a worker with SIGTERM rather than through a shared
+    # multiprocessing.Event, whose lock a lane killed at the wrong moment
+    # would leave held for every other process.
+    signal.signal(signal.SIGTERM, lambda sig, frame: event.set())
+
+
+def _forward(source, target):
+    source.wait()
+    target.set()
+
+
+def run_lane(lane, setup=None):
+    # Worker process body: main.py's loop with the lane's settings.
+    stopping = threading.Event()
+    _on_sigterm(stopping)
+    if lane.cpus:
+        os.sched_setaffinity(0, lane.cpus)
+    sys.stdout = _LinePrefix(sys.stdout, f"[{lane.name}] ")
+    logzero.formatter(logzero.LogFormatter(
+        fmt=f'%(color)s[{lane.name} %(levelname)1.1s %(asctime)s %(module)s:%(lineno)d]%(end_color)s %(message)s'))
+    if setup is not None:
+        setup(lane)
+    import main
+    # Ctrl+C reaches every process in the group; the supervisor alone
+    # handles it and stops the lanes.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    lane.apply(main)
+    main.UPLOAD_IN_PROCESS = False
+    threading.Thread(target=_forward, args=(stopping, main.stop_event), name='lane-stop',
+                     daemon=True).start()
+    main.main()
+    # main() returns on its own only when the lane failed.
+    sys.stdout.flush()
+    if not stopping.is_set():
+        sys.exit(1)
+
+
+def run_uploader(settings):
+    stopping = threading.Event()
+    _on_sigterm(stopping)
+    names = [key.upper() for key in SHARED_SETTINGS]
+    if any(name not in settings for name in names):
+        # main.py's defaults for whatever the config leaves out.
+        import main
+        settings = dict({name: getattr(main, name) for name in names}, **settings)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from outbox import Outbox, OutboxSender
+    outbox = Outbox(settings['OUTBOX_PATH'])
+    pending = outbox.count()
+    if pending:
+        logger.info(f"Uploader: resuming upload of {pending} queued detections")
+    # Lanes add rows from other processes, which cannot wake the sender, so
+    # it checks the outbox every UPLOAD_POLL_INTERVAL instead.
+    sender = OutboxSender(outbox, settings['SERVER_URL'], batch_size=settings['OUTBOX_BATCH_SIZE'],
+                          idle_wait=UPLOAD_POLL_INTERVAL)
+    sender.start()
+    # Polled rather than waited on: the SIGTERM handler sets `stopping` on
+    # this same thread.
+    while not stopping.is_set():
+        time.sleep(0.5)
+    sender.stop(10)
+    if sender.is_alive():
+        logger.warning("Uploader: sender did not stop, outbox left open")
+    else:
+        outbox.close()
+
+
+class _Worker:
+    def __init__(self, name, target, args):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.process = None
+        self.started = None
+        self.failures = 0  # exits in a row, for the backoff
+        self.restarts = 0
+        self.restart_at = None
+
+
+class LaneSupervisor:
+    """Starts the lanes and the upload process and keeps them running.
+
+    A process that exits is restarted after `restart_delay` seconds,
+    doubling with each exit in a row up to `max_restart_delay`; one that ran
+    for `stable_time` seconds starts over at the short delay. `setup` is
+    called with the Lane in each worker before main.py is imported, e.g. to
+    install simulated hardware.
+    """
+
+    def __init__(self, lanes, settings=None, setup=None, restart_delay=1.0,
+                 max_restart_delay=60.0, stable_time=60.0):
+        # spawn, not fork: every lane starts with fresh camera, GPIO and
+        # model state instead of copies of the supervisor's.
+        self._context = multiprocessing.get_context('spawn')
+        self.lanes = list(lanes)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_time = stable_time
+        self._stop = threading.Event()
+        self._workers = [_Worker('uploader', run_uploader, (dict(settings or {}),))]
+        for lane in self.lanes:
+            self._workers.append(_Worker(lane.name, run_lane, (lane, setup)))
+
+    def start(self):
+        for worker in self._workers:
+            self._start(worker)
+        return self
+
+    def _start(self, worker):
+        worker.process = self._context.Process(target=worker.target, args=worker.args,
+                                               name=worker.name)
+        worker.process.start()
+        worker.started = time.monotonic()
+        worker.restart_at = None
+        logger.info(f"Lanes: started {worker.name} (pid {worker.process.pid})")
+
+    def restarts(self):
+        return {worker.name: worker.restarts for worker in self._workers}
+
+    def pids(self):
+        return {worker.name: worker.process.pid for worker in self._workers if worker.process}
+
+    def alive(self):
+        return [worker.name for worker in self._workers if worker.process.is_alive()]
+
+    def poll(self):
+        # Restarts any process that exited; call regularly.
+        now = time.monotonic()
+        for worker in self._workers:
+            if self._stop.is_set():
+                return
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    self._start(worker)
+                continue
+            if worker.process.is_alive():
+                continue
+            worker.process.join()
+            if now - worker.started >= self.stable_time:
+                worker.failures = 0
+            delay = min(self.max_restart_delay, self.restart_delay * 2 ** worker.failures)
+            worker.failures += 1
+            worker.restarts += 1
+            worker.restart_at = now + delay
+            logger.error(f"Lanes: {worker.name} exited with code {worker.process.exitcode}, "
+                         f"restarting in {delay:.0f}s")
+
+    def run(self, interval=0.5):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                self.poll()
+                time.sleep(interval)
+        finally:
+            self.stop()
+
+    def request_stop(self):
+        # Safe to call from a signal handler; run() then stops everything.
+        self._stop.set()
+
+    def stop(self, timeout=15.0):
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        # Lanes first, so the uploader only stops once nothing more can be
+        # added to the outbox.
+        lanes, uploader = self._workers[1:], self._workers[0]
+        for worker in lanes:
+            self._signal(worker)
+        for worker in lanes:
+            self._join(worker, deadline)
+        # The uploader gets its own `timeout` to send what the lanes left,
+        # however long they took.
+        self._signal(uploader)
+        self._join(uploader, time.monotonic() + timeout)
+
+    def _signal(self, worker):
+        if worker.process is not None and worker.process.is_alive():
+            worker.process.terminate()
+
+    def _join(self, worker, deadline):
+        process = worker.process
+        if process is None:
+            return
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            # SIGTERM only asks the worker to stop; one stuck in a camera or
+            # serial read never gets to act on it.
+            logger.warning(f"Lanes: {worker.name} did not stop, killing it")
+            process.kill()
+            process.join(KILL_WAIT)
+            if process.is_alive():
+                logger.error(f"Lanes: {worker.name} (pid {process.pid}) survived SIGKILL")
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CONFIG
+    settings, lanes = load_config(path)
+    supervisor = LaneSupervisor(lanes, settings)
+    signal.signal(signal.SIGTERM, lambda sig, frame: supervisor.request_stop())
+    logger.info(f"Lanes: running {len(lanes)} lanes from {path}")
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+
+
+if __name__ == "__main__":
+    main()
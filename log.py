@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+"""Non-blocking logging for the checkout loop.
+
+Every module logs through logzero's `logger`. setup() moves that logger's
+handlers (the console and, optionally, a rotating log file) behind a
+bounded queue drained by one writer thread, so a log call on the camera,
+sampler or weighing thread only appends a record to the queue and never
+waits on a slow console, journald or SD card. Messages are %-formatted on
+the writer thread, so pass arguments rather than building an f-string:
+
+    logger.debug("Twos: 0x%06x", value)
+
+When the queue is full, records are dropped and counted rather than
+making the caller wait. Levels can be set per module, by file name:
+
+    log.setup(logging.INFO, {'hx711': logging.DEBUG})
+
+Throttle keeps progress lines in hot loops to one per interval.
+"""
+import atexit
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+import logzero
+from logzero import logger
+
+import metrics
+
+DEFAULT_QUEUE_SIZE = 10000
+
+_listener = None
+_queue_handler = None
+_module_filter = None
+
+
+class _ModuleLevels(logging.Filter):
+    def __init__(self, default, levels):
+        super().__init__()
+        self.default = default
+        self.levels = dict(levels)
+
+    def filter(self, record):
+        return record.levelno >= self.levels.get(record.module, self.default)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    # Never blocks: a record that does not fit is counted and dropped.
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # QueueHandler formats the message here, on the caller's thread;
+        # the writer thread's handlers do it instead.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc('log_records_dropped')
+
+
+def setup(level=logging.INFO, module_levels=None, logfile=None, max_bytes=10_000_000,
+          backup_count=3, json=False, queue_size=DEFAULT_QUEUE_SIZE):
+    """Route logzero's logger through the background writer.
+
+    module_levels maps module names to levels that override `level` for
+    that module, in either direction. Calling setup() again reconfigures.
+    """
+    global _listener, _queue_handler, _module_filter
+    shutdown()
+    if json:
+        logzero.json()
+    if logfile:
+        logzero.logfile(logfile, maxBytes=max_bytes, backupCount=backup_count)
+    handlers = list(logger.handlers)
+    for handler in handlers:
+        logger.removeHandler(handler)
+        # Filtering by level happens on the logger; the handlers write
+        # whatever gets through.
+        handler.setLevel(logging.NOTSET)
+    module_levels = dict(module_levels or {})
+    # The logger's own level is the lowest anyone wants, so disabled calls
+    # still return at the first check.
+    logger.setLevel(min([level] + list(module_levels.values())))
+    _module_filter = _ModuleLevels(level, module_levels)
+    logger.addFilter(_module_filter)
+    _queue_handler = _DroppingQueueHandler(queue.Queue(queue_size))
+    logger.addHandler(_queue_handler)
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=False)
+    _listener.start()
+    return logger
+
+
+def shutdown():
+    """Write out queued records and give the handlers back to the logger."""
+    global _listener, _queue_handler, _module_filter
+    if _listener is None:
+        return
+    logger.removeHandler(_queue_handler)
+    logger.removeFilter(_module_filter)
+    _listener.stop()
+    for handler in _listener.handlers:
+        logger.addHandler(handler)
+    _listener = _queue_handler = _module_filter = None
+
+
+def dropped():
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+atexit.register(shutdown)
+
+
+class Throttle:
+    """ready() is true at most once every `interval` seconds.
+
+    For progress lines in loops that run many times a second:
+
+        if progress.ready():
+            logger.info("frame %d", n)
+    """
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._next = 0.0
+
+    def ready(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now < self._next:
+            return False
+        self._next = now + self.interval
+        return True
@@ -1,114 +1,351 @@
 #!/usr/bin/python3
-import cv2
 import os
 import sys
 import time
 import signal
-import gpiod
-import requests
-from edge_impulse_linux.image import ImageImpulseRunner
+import importlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logzero import logger
 from hx711 import HX711
+from filters import TrimmedMean
+from calibration import ZeroTracker
+from scale_events import ScaleEvent, ScaleEventStream, ITEM_ADDED, ITEM_REMOVED
+from recorder import SampleRecorder
+from pipeline import BoundedQueue, Stage, BLOCK, DROP_NEWEST
+from scheduler import InferenceScheduler
+from tracker import IoUTracker
+from catalog import Catalog, UnknownProductError
+from cart import CartSession, MISSING, UNBILLED
+from fusion import FusionDecider, WeightModel
+import metrics
+import log
 
 # Constants
 REFERENCE_UNIT = 186.0897222218
 SERVER_URL = "https://vpaygo.onrender.com/api/detections"
+MODEL_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "autobill_fyp-linux-aarch64-v6.eim")
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "calibration.json")
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "catalog.json")
+CATALOG_RELOAD_INTERVAL = 2.0  # seconds between checks for an edited catalog file
+MAX_TARE_DRIFT = 5.0  # grams the saved tare may be off at boot before a full tare
+GPIO_CHIP = "0"
+DOUT_PIN = 38
+SCK_PIN = 40
+SCALE_SERIAL_PORT = None  # e.g. "/dev/ttyUSB0" to read the HX711 through the Arduino sketch
+ZERO_TRACKING = True  # let the tare follow slow drift while the scale is empty
+# Imported on a startup thread while the model loads instead of before main().
+DEFERRED_IMPORTS = ("cv2", "camera", "frame_cache", "requests", "outbox")
+# Runner class to load the model with; None imports Edge Impulse's in main().
+ImageImpulseRunner = None
+WEIGHT_WINDOW = 20
+SETTLE_TIMEOUT = 3.0  # seconds to wait for the scale to settle after a hit
+SETTLE_TIME = 0.15  # seconds the scale must stay quiet to count as settled
+EVENT_MAX_AGE = 10.0  # ignore item_added events older than this
+RECORDER_PATH = None  # e.g. "/var/tmp/hx711.rec" to keep a ring of raw samples for debugging
+OUTBOX_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "outbox.db")
+# The live server takes one detection per POST; raise once it accepts arrays.
+OUTBOX_BATCH_SIZE = 1
+UPLOAD_IN_PROCESS = True  # False when lanes.py runs one upload process for all lanes
+DETECTION_QUEUE_SIZE = 8
+CART_CAPACITY = 128  # most items one customer can have on the scale
+CAMERA_INDEX = 0
+CAMERA_ROI = None  # (x, y, w, h) of the scale plate in camera pixels, None for the full frame
+IDLE_INFERENCE_INTERVAL = 1.0  # seconds between frames while the scale is empty
+CACHE_THRESHOLD = 4.0  # mean pixel difference (0-255) under which a frame reuses the last result
+CACHE_MAX_AGE = 1.0  # seconds a cached result may be reused
+# Decide on each item from every frame's scores plus its weight instead of
+# waiting for TRACK_MIN_HITS frames over MIN_CONFIDENCE. None turns it on
+# only when every product the model knows has a weight, from catalog.json's
+# weight_g or learned in WEIGHT_STATS_FILE.
+FUSION_ENABLED = None
+FUSION_THRESHOLD = 0.9  # posterior a label needs before the item is priced
+WEIGHT_STATS_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "weight_stats.json")
+MIN_CONFIDENCE = 0.7
+TRACK_MIN_HITS = 3  # frames a box must persist before it counts as an item
+TRACK_MAX_MISSES = 5  # frames a track survives without a matching box
+METRICS_ENABLED = True
+METRICS_PORT = 9100  # plain-text stage latencies on http://127.0.0.1:9100/metrics, None to disable
+METRICS_LOG_INTERVAL = 60.0  # seconds between latency summaries in the log
+# All output goes through log.py's background writer, so the loop never
+# waits on the console or a log file.
+LOG_LEVEL = logging.INFO
+LOG_MODULE_LEVELS = {}  # e.g. {'hx711': logging.DEBUG} to see every raw sample
+LOG_FILE = None  # e.g. "/var/log/vpaygo.log", rotated at 10 MB
+LOG_JSON = False  # one JSON object per line, for log collectors
+PROGRESS_INTERVAL = 10.0  # seconds between frame-count lines
 runner = None
+weight_filter = None
+scale_events = None
+detection_queue = None
+outbox = None
+catalog = None
+fusion = None
+weight_model = None
+stop_event = threading.Event()  # set to leave the detection loop cleanly
 
-# Global variables
-count = 0
-list_label = []
-list_weight = []
+# Items billed to the current customer; closed when they take their goods
+# off the scale.
+cart = CartSession(CART_CAPACITY)
 
 # Product pricing
-PRODUCT_PRICES = {
-    'Apple': {'base_price': 10, 'rate': 0.01},
-    'Monaco': {'base_price': 15, 'rate': 0},
-    'Lays': {'base_price': 20, 'rate': 0}
-}
-
 def calculate_price(label, weight):
-    if label in PRODUCT_PRICES:
-        price_info = PRODUCT_PRICES[label]
-        return price_info['base_price'] + (weight * price_info['rate'])
-    return 0
+    # Raises UnknownProductError for labels missing from the catalog.
+    return catalog.price(label, weight)
 
 def get_weight(hx, num_readings=20):
     try:
-        val = hx.get_weight(num_readings)
+        if weight_filter is not None:
+            val = hx.get_weight_filtered(weight_filter)
+        else:
+            val = hx.get_weight(num_readings)
         return round(val, 1)
     except Exception as e:
-        print(f"Error reading weight: {e}")
+        logger.error("Error reading weight: %s", e)
         return 0
 
 def init_hx711():
-    print("Initializing scale...")
-    chip = gpiod.Chip("0", gpiod.Chip.OPEN_BY_NUMBER)
-    hx = HX711(dout=38, pd_sck=40, gain=128, chip=chip)
+    global weight_filter, scale_events
+    logger.info("Initializing scale...")
+    if SCALE_SERIAL_PORT:
+        from serial_hx711 import SerialHX711
+        hx = SerialHX711(SCALE_SERIAL_PORT, gain=128)
+    else:
+        import gpiod
+        chip = gpiod.Chip(GPIO_CHIP, gpiod.Chip.OPEN_BY_NUMBER)
+        hx = HX711(dout=DOUT_PIN, pd_sck=SCK_PIN, gain=128, chip=chip)
     hx.reset()
-    print("Taring scale...")
     hx.set_reference_unit(REFERENCE_UNIT)
-    hx.tare()
-    print("Scale initialized successfully")
+    # Sample continuously in the background so weighing never blocks the
+    # detection loop on fresh conversions.
+    hx.start_sampling()
+    # A saved tare that still matches the empty scale saves the full tare.
+    if hx.load_calibration(CALIBRATION_FILE, max_drift=MAX_TARE_DRIFT):
+        logger.info("Restored saved tare")
+    else:
+        logger.info("Taring scale...")
+        hx.tare()
+        try:
+            hx.save_calibration(CALIBRATION_FILE)
+        except OSError as e:
+            logger.warning("Could not save calibration: %s", e)
+    if ZERO_TRACKING:
+        hx.add_filter(ZeroTracker(hx))
+    # Trimmed mean over the latest samples, kept up to date by the sampler.
+    weight_filter = hx.add_filter(TrimmedMean(WEIGHT_WINDOW))
+    scale_events = hx.add_filter(ScaleEventStream(hx, settle_time=SETTLE_TIME))
+    scale_events.subscribe(on_scale_event)
+    if RECORDER_PATH:
+        recorder = hx.add_filter(SampleRecorder(RECORDER_PATH, hx))
+        # Channel B's samples too, should anything read it.
+        hx.add_filter(recorder, channel='B')
+    logger.info("Scale initialized successfully")
     return hx
 
+def load_catalog():
+    global catalog
+    catalog = Catalog(CATALOG_PATH)
+    logger.info("Catalog loaded: %d products", len(catalog))
+    return catalog
+
+def preload_modules(names=DEFERRED_IMPORTS):
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Preloading %s failed: %s", name, e)
+
+def send_detection(data):
+    import requests
+    max_retries = 3
+    retry_delay = 1  # seconds
+
+    for attempt in range(max_retries):
+        try:
+            with metrics.timed('http_roundtrip_seconds'):
+                response = requests.post(
+                    SERVER_URL,
+                    json=data,
+                    headers={'Content-Type': 'application/json'},
+                    timeout=5
+                )
+
+            if response.status_code == 200:
+                logger.info("Sent to server successfully: %s, %sg, $%s", data['product'], data['weight'], data['price'])
+                return True
+            logger.warning("Server returned status code: %d", response.status_code)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Request failed: %s", e)
+        if attempt < max_retries - 1:
+            logger.info("Retrying in %d seconds...", retry_delay)
+            time.sleep(retry_delay)
+    return False
+
 def process_detection(label, weight):
-    global count, list_label, list_weight
-    print(f"\nProcessing detection: {label} with weight {weight}g")
-   
+    logger.info("Processing detection: %s with weight %sg", label, weight)
+
     if weight > 2:
         try:
-            # Calculate price and send to server
-            price = calculate_price(label, weight)
+            with metrics.timed('pricing_seconds'):
+                price = calculate_price(label, weight)
             data = {
                 "product": label,
                 "weight": weight,
                 "price": price
             }
-            
-            # Add retry mechanism
-            max_retries = 3
-            retry_delay = 1  # seconds
-            
-            for attempt in range(max_retries):
-                try:
-                    response = requests.post(
-                        SERVER_URL, 
-                        json=data,
-                        headers={'Content-Type': 'application/json'},
-                        timeout=5  # Add timeout
-                    )
-                    
-                    if response.status_code == 200:
-                        print(f"Sent to server successfully: {label}, {weight}g, ${price}")
-                        break
-                    else:
-                        print(f"Server returned status code: {response.status_code}")
-                        if attempt < max_retries - 1:
-                            print(f"Retrying in {retry_delay} seconds...")
-                            time.sleep(retry_delay)
-                except requests.exceptions.RequestException as e:
-                    print(f"Request failed: {e}")
-                    if attempt < max_retries - 1:
-                        print(f"Retrying in {retry_delay} seconds...")
-                        time.sleep(retry_delay)
-
-            list_weight.append(weight)
-            list_label.append(label)
-            count += 1
-            print(f"Detection Count: {count}")
-            
-            if count > 1 and list_label[-1] != list_label[-2]:
-                print("New item detected!")
-                print(f"Previous item: {list_label[-2]}")
-                print(f"Current item: {list_label[-1]}")
-                print(f"Weight: {weight}g")
+            # Into the cart first: an item the cart refuses (CartFullError)
+            # must not reach the server either.
+            previous = cart.last()
+            handle = cart.add(label, weight, price)
+            # Committed to disk; the outbox sender uploads it in the
+            # background. Without the pipeline (e.g. from a script) send inline.
+            try:
+                if outbox is not None:
+                    outbox.add(data)
+                else:
+                    send_detection(data)
+            except Exception:
+                # Not billed after all, so not on the receipt either.
+                cart.remove(handle)
+                raise
+            logger.info("Cart: %d items, %.1fg, $%.2f", len(cart), cart.total_weight_g, cart.total_price)
+
+            if previous is not None and previous.label != label:
+                logger.info("New item detected: %s (%sg) after %s", label, weight, previous.label)
+            reconcile_cart()
+        except UnknownProductError:
+            # Never let an item through for free: it is left off the bill
+            # and reported so the catalog can be fixed.
+            metrics.inc('unknown_products')
+            logger.error("%s is not in the catalog, item not billed", label)
         except Exception as e:
-            print(f"Error communicating with server: {e}")
-            
-    time.sleep(0.5)
+            logger.exception("Error processing detection: %s", e)
+
+def reconcile_cart():
+    # Everything billed should still be on the scale.
+    if scale_events is None or scale_events.settled_weight is None:
+        return
+    check = cart.reconcile(scale_events.settled_weight)
+    if check.status == UNBILLED:
+        metrics.inc('cart_unbilled')
+        logger.warning("Scale holds %.1fg more than the cart, unbilled item?", check.delta_g)
+    elif check.status == MISSING:
+        metrics.inc('cart_missing')
+        logger.warning("Scale holds %.1fg less than the cart", -check.delta_g)
+
+def on_scale_event(event):
+    # Runs on the sampler thread with the HX711 read lock held, so the cart
+    # is left to the weighing stage, in order with the detections.
+    if event.kind != ITEM_REMOVED or detection_queue is None:
+        return
+    if not detection_queue.put(event):
+        metrics.inc('cart_events_dropped')
+        logger.warning("Weighing busy, %.1fg taken off the scale not applied to the cart", -event.delta_g)
+
+def update_cart(event):
+    # An item taken off is dropped from the cart; the scale emptied of the
+    # whole cart is the customer leaving.
+    if not len(cart):
+        return
+    taken = -event.delta_g
+    if abs(event.weight_g) <= cart.tolerance_g and abs(taken - cart.total_weight_g) <= cart.tolerance():
+        print_receipt(cart.close())
+        return
+    item = cart.remove_weight(taken)
+    if item is None:
+        logger.warning("%.1fg taken off the scale matches no item in the cart", taken)
+    else:
+        metrics.inc('cart_removals')
+        logger.info("Removed %s (%sg) from the cart", item.label, item.weight_g)
+
+def print_receipt(receipt):
+    lines = [f"  {item.label:<12}{item.weight_g:>8.1f}g  ${item.price:.2f}" for item in receipt.items]
+    logger.info("Checkout #%d: %d items, %.1fg, $%.2f\n%s", receipt.session, len(receipt.items),
+                receipt.total_weight_g, receipt.total_price, "\n".join(lines))
+
+def weigh_detection(detection):
+    label, confidence = detection
+    # Price from the weight step measured when the scale settled, not a
+    # fresh snapshot.
+    with metrics.timed('weighing_seconds'):
+        event = scale_events.wait_event(ITEM_ADDED, timeout=SETTLE_TIMEOUT, max_age=EVENT_MAX_AGE)
+    weight = round(event.delta_g, 1) if event else 0
+    if weight > 2:
+        logger.info("Weight: %sg", weight)
+        process_detection(label, weight)
+        if weight_model is not None:
+            weight_model.observe(label, weight)
+    else:
+        logger.info("No object detected on scale for %s", label)
+
+def bill_decision(decision):
+    # Fusion decisions already carry the settled weight step.
+    process_detection(decision.label, round(decision.weight_g, 1))
+
+def weighing_step(item):
+    # Handler of the weighing stage, which owns the cart.
+    if isinstance(item, ScaleEvent):
+        update_cart(item)
+    elif fusion is not None:
+        bill_decision(item)
+    else:
+        weigh_detection(item)
+
+def init_fusion(labels):
+    global fusion, weight_model
+    weight_model = WeightModel(catalog)
+    try:
+        weight_model.load(WEIGHT_STATS_FILE)
+    except (OSError, ValueError):
+        pass
+    enabled = FUSION_ENABLED
+    if enabled is None:
+        # Without weights fusion has only the frames to go on, and the
+        # tracker does better with those; its items teach the weights.
+        missing = [label for label in labels if label in catalog and weight_model.expected(label) is None]
+        enabled = not missing
+        if missing:
+            logger.info("Fusion off until these have a weight: %s", ", ".join(missing))
+    if not enabled:
+        return
+    fusion = FusionDecider(labels, weight_model, threshold=FUSION_THRESHOLD, timeout=SETTLE_TIMEOUT)
+    scale_events.subscribe(fusion.on_scale_event)
+
+def start_pipeline():
+    # vision (main thread) -> detection_queue -> weighing -> outbox -> sender
+    # Items taken off the scale reach the weighing stage through the same
+    # queue, from the sampler thread.
+    # The camera never waits: when weighing falls behind new hits are dropped.
+    # Priced items go to the on-disk outbox, so a slow or unreachable server
+    # only delays uploads and never loses them. Under lanes.py the sender
+    # runs in the supervisor's upload process instead.
+    global detection_queue, outbox
+    from outbox import Outbox, OutboxSender
+    detection_queue = BoundedQueue(DETECTION_QUEUE_SIZE, DROP_NEWEST, name='detections')
+    outbox = Outbox(OUTBOX_PATH)
+    stages = [Stage('weighing', weighing_step, detection_queue)]
+    if UPLOAD_IN_PROCESS:
+        pending = outbox.count()
+        if pending:
+            logger.info("Resuming upload of %d queued detections", pending)
+        stages.append(OutboxSender(outbox, SERVER_URL, batch_size=OUTBOX_BATCH_SIZE))
+    for stage in stages:
+        stage.start()
+    return stages
+
+def stop_pipeline(stages, timeout=10):
+    for stage in stages:
+        stage.stop(timeout)
+    stuck = [stage.name for stage in stages if stage.is_alive()]
+    if stuck:
+        # Still using the database; it is closed when the process exits.
+        logger.warning("%s did not stop, outbox left open", ", ".join(stuck))
+    elif outbox is not None:
+        outbox.close()
 
 def sigint_handler(sig, frame):
-    print("\nInterrupted by user")
+    logger.info("Interrupted by user")
     if runner:
         runner.stop()
     sys.exit(0)
@@ -117,72 +354,145 @@ signal.signal(signal.SIGINT, sigint_handler)
 
 def main():
     try:
-        print("\n=== Initializing System ===")
-        hx = init_hx711()
+        boot_start = time.monotonic()
+        log.setup(LOG_LEVEL, LOG_MODULE_LEVELS, logfile=LOG_FILE, json=LOG_JSON)
+        logger.info("=== Initializing System ===")
+        if METRICS_ENABLED:
+            metrics.enable()
+            if METRICS_PORT:
+                try:
+                    metrics.start_http_server(METRICS_PORT)
+                except OSError as e:
+                    # Metrics are optional; a taken port must not stop checkout.
+                    logger.warning("Metrics endpoint on port %s unavailable: %s", METRICS_PORT, e)
+            metrics.start_summary_log(METRICS_LOG_INTERVAL)
+        # Bringing up the scale and loading the model each take seconds and
+        # do not depend on each other, so the scale and the heavy imports
+        # run on startup threads while the model loads here.
+        startup = ThreadPoolExecutor(max_workers=3, thread_name_prefix='startup')
+        scale_ready = startup.submit(init_hx711)
+        catalog_ready = startup.submit(load_catalog)
+        startup.submit(preload_modules)
+        startup.shutdown(wait=False)
 
-        print("\n=== Loading Model ===")
-        dir_path = os.path.dirname(os.path.realpath(__file__))
-        modelfile = os.path.join(dir_path, "autobill_fyp-linux-aarch64-v6.eim")
-        print(f"Loading model from: {modelfile}")
+        logger.info("=== Loading Model ===")
+        modelfile = MODEL_FILE
+        logger.info("Loading model from: %s", modelfile)
 
         if not os.path.exists(modelfile):
-            print(f"Error: Model file not found at {modelfile}")
+            logger.error("Model file not found at %s", modelfile)
             return
 
-        with ImageImpulseRunner(modelfile) as runner:
+        # edge_impulse_linux.image imports cv2 and numpy itself, so it is
+        # imported here, with the scale and catalog threads already running.
+        runner_class = ImageImpulseRunner
+        if runner_class is None:
+            runner_class = importlib.import_module('edge_impulse_linux.image').ImageImpulseRunner
+        stages = []
+        camera = None
+        with runner_class(modelfile) as runner:
             try:
-                print("\n=== Initializing Model ===")
+                logger.info("=== Initializing Model ===")
                 model_info = runner.init()
-                print(f"Model loaded: {model_info['project']['name']}")
+                logger.info("Model loaded: %s", model_info['project']['name'])
                 labels = model_info['model_parameters']['labels']
-                print(f"Available labels: {labels}")
+                logger.info("Available labels: %s", labels)
+                scale_ready.result()
+                # Model label -> product id is resolved once here, and the
+                # catalog file is watched for edits from now on.
+                catalog_ready.result().bind_labels(labels)
+                catalog.watch(CATALOG_RELOAD_INTERVAL)
+                init_fusion(labels)
+                from camera import CameraCapture
+                from frame_cache import InferenceCache
+
+                logger.info("=== Starting Detection Loop === (Ctrl+C to exit)")
+
+                stages = start_pipeline()
+                # Classify at full rate only while something is happening on
+                # the scale; an empty scale gets one frame a second.
+                scheduler = InferenceScheduler(scale_events, idle_interval=IDLE_INFERENCE_INTERVAL)
+                # Frames are cropped and resized to the model input once, on
+                # the capture thread, and only the newest one is ever decoded.
+                params = model_info['model_parameters']
+                camera = CameraCapture(CAMERA_INDEX, roi=CAMERA_ROI,
+                                       size=(params['image_input_width'], params['image_input_height']))
+                camera.start()
+                cache = InferenceCache(threshold=CACHE_THRESHOLD, max_age=CACHE_MAX_AGE)
 
-                print("\n=== Starting Detection Loop ===")
-                print("Press Ctrl+C to exit")
+                def infer(img):
+                    with metrics.timed('inference_seconds'):
+                        features, cropped = runner.get_features_from_image(img)
+                        return runner.classify(features)
 
+                # One weigh/price event per physical item, not per frame.
+                tracker = IoUTracker(min_hits=TRACK_MIN_HITS, max_misses=TRACK_MAX_MISSES,
+                                     min_confidence=MIN_CONFIDENCE)
                 frame_count = 0
-                last_detection = {'label': None, 'time': 0}
-               
-                for res, img in runner.classifier(0):
+                progress = log.Throttle(PROGRESS_INTERVAL)
+                last_res = None
+                logger.info("Ready in %.1fs", time.monotonic() - boot_start)
+
+                while not stop_event.is_set():
+                    scheduler.wait()
+                    timestamp, img = camera.read()
+                    if fusion is not None and fusion.pending():
+                        # A settled item needs fresh looks to be decided,
+                        # and the scene hardly changes while it waits.
+                        cache.invalidate()
+                    res = cache.classify(img, infer)
                     frame_count += 1
-                    print(f"\rProcessing frame {frame_count}", end='')
-
-                    if "result" in res and "bounding_boxes" in res["result"]:
-                        boxes = res["result"]["bounding_boxes"]
-                        for box in boxes:
-                            if box["value"] > 0.7:
-                                label = box["label"]
-                                confidence = box["value"]
-                                current_time = time.time()
-                               
-                                if (label != last_detection['label'] and
-                                    current_time - last_detection['time'] > 3):
-                                   
-                                    print(f"\nDetected {label} with confidence {confidence:.2f}")
-                                   
-                                    weight = get_weight(hx)
-                                    if weight > 2:
-                                        print(f"Weight: {weight}g")
-                                        process_detection(label, weight)
-                                       
-                                        last_detection = {
-                                            'label': label,
-                                            'time': current_time
-                                        }
-                                    else:
-                                        print("No object detected on scale")
-                   
-                    time.sleep(0.1)
+                    metrics.inc('frames')
+                    if progress.ready():
+                        logger.info("Processed %d frames (cache hit rate %.0f%%)", frame_count,
+                                    100 * cache.hit_rate())
+
+                    if fusion is not None:
+                        # A cache hit is the same result again, not a new look.
+                        if res is not last_res:
+                            fusion.add_frame(res.get("result", {}), timestamp)
+                            last_res = res
+                        decision = fusion.decide()
+                        if decision is not None:
+                            if decision.low_confidence:
+                                metrics.inc('low_confidence_decisions')
+                            logger.info("Detected %s (%.2f from %d frames and %.1fg)", decision.label,
+                                        decision.posterior, decision.frames, decision.weight_g)
+                            # The weight step is already used up, so a decided
+                            # item waits for room rather than going unbilled.
+                            detection_queue.put(decision, policy=BLOCK)
+                            scheduler.item_classified()
+                        continue
+
+                    boxes = res.get("result", {}).get("bounding_boxes", [])
+                    for track in tracker.update(boxes, timestamp):
+                        logger.info("Detected %s with confidence %.2f (track %d)", track.label, track.confidence, track.id)
+                        if detection_queue.put((track.label, track.confidence)):
+                            scheduler.item_classified()
+                        else:
+                            logger.warning("Weighing busy, detection dropped")
 
             except Exception as e:
-                print(f"\nError during detection: {e}")
+                logger.exception("Error during detection: %s", e)
             finally:
                 if runner:
                     runner.stop()
-                    print("\nRunner stopped")
+                    logger.info("Runner stopped")
+                if camera is not None:
+                    camera.stop()
+                if catalog is not None:
+                    catalog.stop_watching()
+                if weight_model is not None:
+                    try:
+                        weight_model.save(WEIGHT_STATS_FILE)
+                    except OSError as e:
+                        logger.warning("Could not save weight statistics: %s", e)
+                stop_pipeline(stages)
 
     except Exception as e:
-        print(f"\nGlobal error: {e}")
+        logger.exception("Global error: %s", e)
+    finally:
+        log.shutdown()
 
 if __name__ == "__main__":
     main()
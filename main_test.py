@@ -1,15 +1,19 @@
 #!/usr/bin/python3
-import cv2
 import os
 import sys
 import time
 import signal
+import logging
 import gpiod
+from logzero import logger
 from edge_impulse_linux.image import ImageImpulseRunner
 from hx711 import HX711
+import log
 
 # Constants
 REFERENCE_UNIT = 186.0897222218  # Replace with your calibrated reference unit
+LOG_LEVEL = logging.INFO  # logging.DEBUG shows every classifier response and score
+PROGRESS_INTERVAL = 5.0  # seconds between frame-count lines
 runner = None
 
 # Tracking variables
@@ -68,6 +72,7 @@ signal.signal(signal.SIGINT, sigint_handler)
 
 def main():
     """Main function to load the model, process camera frames, and detect objects."""
+    log.setup(LOG_LEVEL)
     try:
         print("\n=== Initializing System ===")
         hx = init_hx711()
@@ -93,25 +98,23 @@ def main():
                 print("Press Ctrl+C to exit")
 
                 frame_count = 0
+                progress = log.Throttle(PROGRESS_INTERVAL)
                 for res, img in runner.classifier(0):  # Use camera port 0
                     frame_count += 1
-                    print(f"\rProcessing frame {frame_count}", end='')  # Increment frame count
-                   
-                    # Debug: Print full response
-                    print("\nFull response from classifier:", res)
+                    if progress.ready():
+                        logger.info("Processing frame %d", frame_count)
+
+                    # Debug: full response, formatted only when DEBUG is on
+                    logger.debug("Full response from classifier: %s", res)
 
                     if "classification" in res["result"].keys():
                         predictions = res["result"]["classification"]
-                        print("\nPredictions found:")
-                       
-                        # Print all scores
-                        for label, score in predictions.items():
-                            print(f"  {label}: {score:.2f}")
+                        logger.debug("Predictions: %s", predictions)
 
                         # Focus on 'Apple' with a lower confidence threshold
                         if "Apple" in predictions:
                             score = predictions["Apple"]
-                            print(f"Apple confidence score: {score:.2f}")
+                            logger.debug("Apple confidence score: %.2f", score)
                             if score > 0.3:  # Reduced confidence threshold
                                 print(f"\nApple detected with confidence: {score:.2f}")
                                 weight = get_weight(hx)
@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+"""Fixed-memory latency histograms and counters for the checkout hot paths.
+
+Nothing is recorded until enable() is called; while disabled every entry
+point returns after a single module-global check. Histograms use fixed
+log-spaced buckets (10 per decade from 1 us to 100 s by default), so memory
+does not grow with the number of samples and percentiles are interpolated
+within one bucket (buckets are about 25% wide).
+
+    import metrics
+    metrics.enable()
+    with metrics.timed('inference_seconds'):
+        ...
+    metrics.start_http_server(9100)   # GET /metrics
+    metrics.start_summary_log(60)     # p50/p95/p99 to the log every minute
+"""
+import bisect
+import contextlib
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logzero import logger
+
+enabled = False
+
+
+class Histogram:
+    def __init__(self, name, low=1e-6, high=100.0, buckets_per_decade=10):
+        self.name = name
+        decades = math.log10(high / low)
+        count = int(math.ceil(decades * buckets_per_decade))
+        self.bounds = [low * 10 ** (i / buckets_per_decade) for i in range(count + 1)]
+        # counts[i] holds values <= bounds[i]; the last slot is overflow.
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        # Unlocked: under the GIL a racing update can at worst lose one count.
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            if bucket and seen + bucket >= rank:
+                if index >= len(self.bounds):
+                    return self.max
+                # Interpolate linearly inside the bucket.
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = min(self.bounds[index], self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket
+            seen += bucket
+        return self.max
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Counter:
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, Histogram(name))
+        return hist
+
+    def counter(self, name):
+        counter = self.counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self.counters.setdefault(name, Counter(name))
+        return counter
+
+    def render_text(self):
+        lines = []
+        for name, counter in sorted(self.counters.items()):
+            lines.append(f"{name} {counter.value}")
+        for name, hist in sorted(self.histograms.items()):
+            lines.append(f"{name}_count {hist.count}")
+            lines.append(f"{name}_sum {hist.sum:.6f}")
+            lines.append(f"{name}_max {hist.max:.6f}")
+            for p in (50, 95, 99):
+                lines.append(f'{name}{{quantile="0.{p}"}} {hist.percentile(p):.6f}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        parts = []
+        for name, hist in sorted(self.histograms.items()):
+            if hist.count:
+                parts.append(f"{name}: n={hist.count} p50={hist.percentile(50) * 1e3:.1f}ms "
+                             f"p95={hist.percentile(95) * 1e3:.1f}ms p99={hist.percentile(99) * 1e3:.1f}ms")
+        for name, counter in sorted(self.counters.items()):
+            parts.append(f"{name}={counter.value}")
+        return "; ".join(parts)
+
+
+registry = Registry()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def observe(name, value):
+    if enabled:
+        registry.histogram(name).observe(value)
+
+
+def inc(name, amount=1):
+    if enabled:
+        registry.counter(name).inc(amount)
+
+
+class _Timer:
+    __slots__ = ('hist', 'start')
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+        return False
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timed(name):
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(registry.histogram(name))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def start_summary_log(interval=60.0):
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            summary = registry.summary()
+            if summary:
+                logger.info(f"metrics: {summary}")
+
+    threading.Thread(target=run, name='metrics-log', daemon=True).start()
+    return stop
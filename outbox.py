@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+"""Durable outbox for detections bound for the server.
+
+Detections are committed to a local SQLite file before anything touches the
+network. OutboxSender drains the file on a background thread through one
+pooled requests.Session, several detections per request, with exponential
+backoff while the server is unreachable. Every detection has an
+idempotency key, sent in the Idempotency-Key header so the request body
+stays what the server already accepts, and a batch retried after a lost
+response is not counted twice.
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+from logzero import logger
+
+import metrics
+
+PENDING = 'pending'
+FAILED = 'failed'
+# Worth retrying as they are: timeouts, rate limits, and auth errors that
+# last until the token is fixed. Other 4xx rejections are final.
+RETRY_STATUS = (401, 403, 408, 429)
+PAYLOAD_TOO_LARGE = 413
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending'
+)
+"""
+
+
+class Outbox:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._added = threading.Event()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+    def add(self, data):
+        key = str(uuid.uuid4())
+        with self._lock:
+            self._db.execute("INSERT INTO outbox (key, payload, created) VALUES (?, ?, ?)",
+                             (key, json.dumps(data), time.time()))
+        self._added.set()
+        return key
+
+    def pending(self, limit):
+        # Oldest first, as (id, key, payload) tuples.
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, key, payload FROM outbox WHERE status = ? ORDER BY id LIMIT ?",
+                (PENDING, limit)).fetchall()
+        return [(row_id, key, json.loads(payload)) for row_id, key, payload in rows]
+
+    def ack(self, ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def retry(self, ids):
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?",
+                                 [(i,) for i in ids])
+
+    def fail(self, ids):
+        # Rejected by the server; kept for inspection but never resent.
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET status = ?, attempts = attempts + 1 WHERE id = ?",
+                                 [(FAILED, i) for i in ids])
+
+    def count(self, status=PENDING):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = ?",
+                                    (status,)).fetchone()[0]
+
+    def wake(self):
+        self._added.set()
+
+    def wait_added(self, timeout):
+        added = self._added.wait(timeout)
+        self._added.clear()
+        return added
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OutboxSender(threading.Thread):
+    """Posts pending outbox rows to `url`.
+
+    A batch of one is posted as a single JSON object, a larger batch as a JSON
+    array. The Idempotency-Key header holds the detections' keys, comma
+    separated in the same order. A batch the server finds too large (413)
+    is split in half and each half sent on its own.
+    """
+
+    def __init__(self, outbox, url, batch_size=10, timeout=5, backoff=1.0,
+                 max_backoff=60.0, idle_wait=1.0, session=None):
+        super().__init__(name='outbox-sender', daemon=True)
+        self.outbox = outbox
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_wait = idle_wait
+        self.session = session or requests.Session()
+        self.sent = 0
+        self.failures = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            batch = self.outbox.pending(self.batch_size)
+            if not batch:
+                self.outbox.wait_added(self.idle_wait)
+                continue
+            if self.send_batch(batch):
+                self.failures = 0
+            else:
+                self.failures += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1))
+                self._stop_event.wait(delay * random.uniform(0.5, 1.0))
+
+    def send_batch(self, batch):
+        ids = [row_id for row_id, _, _ in batch]
+        items = [data for _, _, data in batch]
+        headers = {'Content-Type': 'application/json',
+                   'Idempotency-Key': ','.join(key for _, key, _ in batch)}
+        body = items[0] if len(items) == 1 else items
+        try:
+            with metrics.timed('http_roundtrip_seconds'):
+                response = self.session.post(self.url, data=json.dumps(body), headers=headers,
+                                             timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Outbox: {len(items)} detection(s) not sent: {e}")
+            metrics.inc('upload_errors')
+            self.outbox.retry(ids)
+            return False
+        # 409 means the server already has these keys from an earlier try.
+        if response.status_code < 300 or response.status_code == 409:
+            self.outbox.ack(ids)
+            self.sent += len(ids)
+            metrics.inc('detections_uploaded', len(ids))
+            return True
+        if response.status_code == PAYLOAD_TOO_LARGE and len(batch) > 1:
+            half = len(batch) // 2
+            logger.warning(f"Outbox: batch of {len(batch)} too large, sending it in halves")
+            first = self.send_batch(batch[:half])
+            return self.send_batch(batch[half:]) and first
+        if 400 <= response.status_code < 500 and response.status_code not in RETRY_STATUS:
+            for _, key, data in batch:
+                logger.error(f"Outbox: server rejected detection {key} ({response.status_code}), "
+                             f"not resending: {data}")
+            metrics.inc('detections_rejected', len(ids))
+            self.outbox.fail(ids)
+            return True
+        if response.status_code in (401, 403):
+            logger.error(f"Outbox: server refused credentials ({response.status_code}), "
+                         f"{len(ids)} detection(s) kept for retry")
+        else:
+            logger.warning(f"Outbox: server returned {response.status_code}, will retry")
+        metrics.inc('upload_errors')
+        self.outbox.retry(ids)
+        return False
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.outbox.wake()
+        self.join(timeout)
+        if not self.is_alive():
+            self.session.close()
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""Bounded queues and worker stages for the checkout pipeline.
+
+Each stage is a daemon thread that takes items from its inbox, runs a
+handler and passes the result on. Queues are bounded and have an explicit
+policy for when they are full, so a slow stage can only hold back the
+stages that feed it through a BLOCK queue, never through a DROP queue.
+"""
+import queue
+import threading
+from logzero import logger
+
+BLOCK = 'block'              # producer waits for room
+DROP_NEWEST = 'drop_newest'  # the item being put is discarded
+DROP_OLDEST = 'drop_oldest'  # the oldest queued item is discarded
+
+_STOP = object()
+
+
+class BoundedQueue:
+    def __init__(self, maxsize, policy=BLOCK, name='queue'):
+        if policy not in (BLOCK, DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"BoundedQueue: unknown policy {policy!r}")
+        self.name = name
+        self.policy = policy
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, item, timeout=None, policy=None):
+        # Returns False if the item was dropped (DROP_NEWEST only). `policy`
+        # overrides the queue's own for this item, e.g. BLOCK for one that
+        # must not be lost.
+        policy = policy or self.policy
+        if policy == BLOCK:
+            self._queue.put(item, timeout=timeout)
+            return True
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                pass
+            self.dropped += 1
+            if policy == DROP_NEWEST:
+                logger.debug("%s full, dropped newest item", self.name)
+                return False
+            try:
+                self._queue.get_nowait()
+                logger.debug("%s full, dropped oldest item", self.name)
+            except queue.Empty:
+                pass
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def close(self):
+        # Always queued behind pending items so the consumer drains first.
+        self._queue.put(_STOP)
+
+
+class Stage(threading.Thread):
+    def __init__(self, name, handler, inbox, outbox=None):
+        super().__init__(name=name, daemon=True)
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processed = 0
+        self.failed = 0
+
+    def run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _STOP:
+                break
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                self.failed += 1
+                logger.error("%s: %s", self.name, e)
+                continue
+            self.processed += 1
+            if self.outbox is not None and result is not None:
+                self.outbox.put(result)
+
+    def stop(self, timeout=None):
+        self.inbox.close()
+        self.join(timeout)
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+"""Raw HX711 sample recorder backed by a memory-mapped ring file.
+
+Every conversion is written as a fixed 16-byte record (timestamp, raw
+24-bit value, gain, channel) straight into the mapping with pack_into, so
+recording allocates no buffers per sample and costs a few hundred
+nanoseconds. When the ring is full the oldest records are overwritten.
+
+    recorder = hx.add_filter(SampleRecorder("/var/tmp/hx711.rec", hx))
+    hx.add_filter(recorder, channel='B')
+
+Added to channel B's filters as well, it also records the channel B
+samples read while interleaving (or by get_value_B()), tagged with
+their channel, so a session can be replayed with both channels.
+
+RecordingReader exposes the file as a NumPy structured array backed by the
+mapping itself (no copy) for offline analysis:
+
+    samples = RecordingReader("/var/tmp/hx711.rec").ordered()
+    samples['raw'], samples['timestamp']
+"""
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b'HX711REC'
+VERSION = 1
+# magic, version, record size, capacity, records written so far
+HEADER = struct.Struct('<8sIIQQ')
+RECORD = struct.Struct('<diBBxx')
+COUNT_OFFSET = 24
+
+CHANNEL_A = 0
+CHANNEL_B = 1
+
+
+def record_dtype():
+    import numpy as np
+    return np.dtype([('timestamp', '<f8'), ('raw', '<i4'), ('gain', 'u1'),
+                     ('channel', 'u1'), ('pad', 'V2')])
+
+
+class SampleRecorder:
+    # Follows the filters.py protocol so HX711.add_filter() feeds it every
+    # conversion; reset() is called on gain changes and picks up channel A's
+    # new gain. The channel of each sample is the HX711's lastChannel.
+    def __init__(self, path, hx=None, capacity=1 << 20):
+        self.path = path
+        self.hx = hx
+        size = HEADER.size + capacity * RECORD.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing != size:
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        magic, version, record_size, old_capacity, count = HEADER.unpack_from(self._mm, 0)
+        if (existing != size or magic != MAGIC or version != VERSION
+                or record_size != RECORD.size or old_capacity != capacity):
+            count = 0
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, RECORD.size, capacity, count)
+        self.capacity = capacity
+        self.count = count
+        self._pack = RECORD.pack_into
+        self._pack_count = struct.Struct('<Q').pack_into
+        self.gain = 128
+        self.reset()
+
+    def reset(self):
+        # Channel B is always read at 32, so only A's gain needs keeping.
+        if self.hx is not None and self.hx.get_gain() != 32:
+            self.gain = self.hx.get_gain()
+
+    def add(self, raw):
+        if self.hx is not None and self.hx.lastChannel == 'B':
+            self.record(raw, 32, CHANNEL_B, time.time())
+        else:
+            self.record(raw, self.gain, CHANNEL_A, time.time())
+
+    def record(self, raw, gain, channel, timestamp):
+        count = self.count
+        self._pack(self._mm, HEADER.size + (count % self.capacity) * RECORD.size,
+                   timestamp, raw, gain, channel)
+        count += 1
+        self.count = count
+        self._pack_count(self._mm, COUNT_OFFSET, count)
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+
+
+class RecordingReader:
+    def __init__(self, path):
+        import numpy as np
+        with open(path, 'rb') as f:
+            magic, version, record_size, capacity, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path} is not an HX711 recording")
+        self.path = path
+        self.capacity = capacity
+        self.count = count
+        self.records = np.memmap(path, dtype=record_dtype(), mode='r',
+                                 offset=HEADER.size, shape=(capacity,))
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def ordered(self):
+        # Oldest first. A view of the mapping unless the ring has wrapped, in
+        # which case the two halves have to be joined into a copy.
+        import numpy as np
+        if self.count <= self.capacity:
+            return self.records[:self.count]
+        head = self.count % self.capacity
+        return np.concatenate((self.records[head:], self.records[:head]))
+
+    def latest(self, n):
+        samples = self.ordered()
+        return samples[-n:] if n < len(samples) else samples
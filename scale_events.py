@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+"""Settle detection and item-added / item-removed events for the scale.
+
+ScaleEventStream is fed HX711 samples (it follows the filters.py protocol,
+so attach it with HX711.add_filter()). It keeps a short window of weights,
+calls the scale settled when their standard deviation has stayed under a
+threshold for at least `settle_time` seconds, and emits an event whenever
+the settled weight has stepped by more than `step_threshold` grams since
+the last settle.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+ITEM_ADDED = 'item_added'
+ITEM_REMOVED = 'item_removed'
+# Sent to subscribers only, when a settled scale starts moving.
+SCALE_MOVING = 'scale_moving'
+
+ScaleEvent = namedtuple('ScaleEvent', ['kind', 'delta_g', 'weight_g', 'timestamp'])
+
+
+class ScaleEventStream:
+    def __init__(self, hx=None, window=10, settle_threshold=1.0, step_threshold=2.0,
+                 max_events=32, settle_time=0.0):
+        self.hx = hx
+        self.window = window
+        self.settle_threshold = settle_threshold
+        self.step_threshold = step_threshold
+        # A sample-count window shrinks in time as the sample rate goes up,
+        # so quiet windows must also last this long to count.
+        self.settle_time = settle_time
+        self._quiet_since = None
+        self._weights = deque(maxlen=window)
+        self._events = deque(maxlen=max_events)
+        self._listeners = []
+        self._cond = threading.Condition()
+        self.settled = False
+        self.settled_weight = None
+        self.settled_at = None
+
+    # filters.py protocol: raw HX711 values in, converted with the scale's
+    # current offset and calibration.
+    def add(self, raw):
+        weight = self.hx.value_to_weight(raw - self.hx.get_offset_A())
+        self.feed(weight, time.monotonic())
+
+    def ready(self):
+        return self.settled
+
+    def value(self):
+        return self.settled_weight
+
+    def reset(self):
+        with self._cond:
+            self._weights.clear()
+            self._quiet_since = None
+            self.settled = False
+
+    def subscribe(self, callback):
+        # Callbacks run on the thread feeding samples and must not block.
+        self._listeners.append(callback)
+
+    def feed(self, weight, timestamp):
+        event = None
+        with self._cond:
+            self._weights.append(weight)
+            if len(self._weights) < self.window:
+                return
+            mean = sum(self._weights) / self.window
+            variance = sum((w - mean) ** 2 for w in self._weights) / self.window
+            if variance > self.settle_threshold ** 2:
+                self._quiet_since = None
+                if self.settled:
+                    self.settled = False
+                    event = ScaleEvent(SCALE_MOVING, 0.0, mean, timestamp)
+            else:
+                if self._quiet_since is None:
+                    self._quiet_since = timestamp
+                if timestamp - self._quiet_since < self.settle_time:
+                    return
+                # A light item set down gently may never unsettle the window,
+                # so a step is checked on every quiet window, not only after
+                # motion.
+                if self.settled_weight is not None:
+                    delta = mean - self.settled_weight
+                    if abs(delta) >= self.step_threshold:
+                        kind = ITEM_ADDED if delta > 0 else ITEM_REMOVED
+                        event = ScaleEvent(kind, delta, mean, timestamp)
+                        self._events.append(event)
+                if event is not None or not self.settled:
+                    self.settled_weight = mean
+                    self.settled_at = timestamp
+                    self.settled = True
+                    self._cond.notify_all()
+        if event is not None:
+            for callback in self._listeners:
+                callback(event)
+
+    def wait_settled(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.settled, timeout)
+
+    def wait_event(self, kind=None, timeout=None, max_age=None):
+        # Oldest pending event of `kind`, waiting up to `timeout` for one.
+        # Events older than `max_age` seconds are dropped as stale.
+        def pending():
+            now = time.monotonic()
+            for event in self._events:
+                if max_age is not None and now - event.timestamp > max_age:
+                    continue
+                if kind is None or event.kind == kind:
+                    return event
+            return None
+
+        with self._cond:
+            event = self._cond.wait_for(pending, timeout)
+            if event is not None:
+                self._events.remove(event)
+            return event
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""Weight-triggered scheduling of model inference.
+
+While the scale reads steady at tare there is nothing to classify, so the
+scheduler lets only one frame through every `idle_interval` seconds (or none
+when it is None). Movement on the scale switches it to full rate until the
+item has been classified or `active_timeout` seconds pass with a quiet
+scale. So does a weight step that settles without any movement being seen
+(a light item set down gently), but not the step of an item classified in
+the last `classified_grace` seconds, which is that item settling.
+"""
+import threading
+import time
+
+from scale_events import ITEM_ADDED, SCALE_MOVING
+
+IDLE = 'idle'
+ACTIVE = 'active'
+
+
+class InferenceScheduler:
+    def __init__(self, scale_events=None, idle_interval=1.0, active_timeout=5.0, classified_grace=3.0):
+        self.scale_events = scale_events
+        self.idle_interval = idle_interval
+        self.active_timeout = active_timeout
+        self.classified_grace = classified_grace
+        self.state = IDLE
+        self.active_since = 0.0
+        self._classified_at = None
+        self.frames_run = 0
+        self._last_idle_frame = 0.0
+        self._wake = threading.Event()
+        if scale_events is not None:
+            scale_events.subscribe(self._on_scale_event)
+
+    def _on_scale_event(self, event):
+        if event.kind == SCALE_MOVING:
+            self.activate()
+        elif event.kind == ITEM_ADDED:
+            classified_at = self._classified_at
+            if classified_at is None or time.monotonic() - classified_at > self.classified_grace:
+                self.activate()
+
+    def activate(self):
+        self.active_since = time.monotonic()
+        self.state = ACTIVE
+        self._wake.set()
+
+    def item_classified(self):
+        self.state = IDLE
+        self._last_idle_frame = self._classified_at = time.monotonic()
+
+    def _expire(self, now):
+        if self.state != ACTIVE or now - self.active_since < self.active_timeout:
+            return
+        # Keep going while the scale is still moving.
+        if self.scale_events is not None and not self.scale_events.settled:
+            return
+        self.state = IDLE
+        self._last_idle_frame = now
+
+    def wait(self):
+        # Block until the next frame should be classified.
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            self._expire(now)
+            if self.state == ACTIVE:
+                self.frames_run += 1
+                return
+            if self.idle_interval is None:
+                self._wake.wait()
+                continue
+            remaining = self._last_idle_frame + self.idle_interval - now
+            if remaining <= 0:
+                self._last_idle_frame = now
+                self.frames_run += 1
+                return
+            self._wake.wait(remaining)
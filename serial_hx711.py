@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+"""HX711 read through an Arduino over a serial port.
+
+The Arduino (Ardunio/Ardunio_Loadcell) does the timing-critical clocking
+and streams every conversion as an 8-byte frame:
+
+    0xAA 0x55 seq gain v0 v1 v2 crc
+
+`seq` counts frames modulo 256 so dropped frames can be counted, `gain` is
+the HX711 pulse code (1 = A/128, 3 = A/64, 2 = B/32), v0..v2 is the signed
+24-bit reading, least significant byte first, and `crc` is CRC-8 (poly
+0x07) over seq..v2. Commands to the board are b'g' + pulse code, b'd'
+(power down) and b'u' (power up).
+
+SerialHX711 has the same interface as hx711.HX711. Frames are read on the
+sampler thread into the same ring buffer and filters, so tare, calibration,
+get_samples() and filters behave exactly as with the GPIO backend. Channel
+B is read by switching gain (get_value_B(), tare_B()); interleave_channels()
+and the bit-level readRawBytes() need the clock line and raise
+HX711UnsupportedError. It does not need libgpiod.
+"""
+import threading
+import time
+
+import serial
+from logzero import logger
+
+import metrics
+from hx711 import HX711, HX711TimeoutError, HX711UnsupportedError, DEFAULT_BUFFER_SIZE, DEFAULT_READY_TIMEOUT
+
+DEFAULT_BAUDRATE = 115200
+SYNC = b'\xaa\x55'
+FRAME_SIZE = 8
+GAIN_CODES = {128: 1, 64: 3, 32: 2}
+
+
+def _crc8_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xff if crc & 0x80 else (crc << 1) & 0xff
+        table.append(crc)
+    return bytes(table)
+
+
+_CRC8 = _crc8_table()
+
+
+def crc8(data):
+    crc = 0
+    for byte in data:
+        crc = _CRC8[crc ^ byte]
+    return crc
+
+
+def encode_frame(seq, gain_code, value):
+    body = bytes([seq & 0xff, gain_code]) + (value & 0xffffff).to_bytes(3, 'little')
+    return SYNC + body + bytes([crc8(body)])
+
+
+class SerialHX711(HX711):
+    def __init__(self, port='/dev/ttyUSB0', baudrate=DEFAULT_BAUDRATE, gain=128,
+                 buffer_size=DEFAULT_BUFFER_SIZE, ready_timeout=DEFAULT_READY_TIMEOUT,
+                 serial_port=None):
+        # serial_port: an already open pyserial-like object, used instead of
+        # opening `port`.
+        self.serial = serial_port or serial.Serial(port, baudrate, timeout=ready_timeout)
+        self.ready_timeout = ready_timeout
+        self.mutex_flag = True
+        self.readLock = threading.RLock()
+        self._buffer = bytearray()
+        self._seq = None
+        self.frames = 0
+        self.dropped_frames = 0
+        self.crc_errors = 0
+        self._init_state(buffer_size)
+        self.serial.reset_input_buffer()
+        try:
+            self.set_gain(gain)
+        except Exception:
+            self.serial.close()
+            raise
+        # The board streams regardless, so the sampler always runs.
+        self.start_sampling()
+
+    def close(self):
+        self.stop_sampling()
+        self.serial.close()
+
+    def _select_reader(self):
+        pass
+
+    def is_ready(self):
+        return len(self._buffer) >= FRAME_SIZE or self.serial.in_waiting > 0
+
+    def wait_ready(self, timeout=None):
+        # Reads block on the port itself; see _next_frame().
+        pass
+
+    def _next_frame(self):
+        # Next (seq, gain code, value) with a valid checksum. Garbage and
+        # corrupt frames are skipped by searching for the next sync bytes.
+        buffer = self._buffer
+        deadline = None if self.ready_timeout is None else time.monotonic() + self.ready_timeout
+        while True:
+            start = buffer.find(SYNC)
+            if start < 0:
+                del buffer[:max(0, len(buffer) - 1)]
+            elif len(buffer) - start >= FRAME_SIZE:
+                frame = buffer[start:start + FRAME_SIZE]
+                if crc8(frame[2:7]) == frame[7]:
+                    del buffer[:start + FRAME_SIZE]
+                    return frame[2], frame[3], int.from_bytes(frame[4:7], 'little')
+                self.crc_errors += 1
+                metrics.inc('hx711_serial_crc_errors')
+                del buffer[:start + 1]
+                continue
+            else:
+                del buffer[:start]
+            if deadline is not None and time.monotonic() > deadline:
+                raise HX711TimeoutError(f"HX711: no frames from {self.serial.port} "
+                                        f"for {self.ready_timeout}s, is the board connected?")
+            buffer += self.serial.read(max(1, min(self.serial.in_waiting, 4096)))
+
+    def _read_conversion(self):
+        with self.readLock:
+            deadline = None if self.ready_timeout is None else time.monotonic() + self.ready_timeout
+            resent = False
+            while True:
+                seq, gain_code, value = self._next_frame()
+                if self._seq is not None:
+                    gap = (seq - self._seq - 1) & 0xff
+                    if gap:
+                        self.dropped_frames += gap
+                        metrics.inc('hx711_serial_dropped_frames', gap)
+                self._seq = seq
+                self.frames += 1
+                # Frames already in flight when the gain changed.
+                if gain_code == self.GAIN:
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    if resent:
+                        raise HX711TimeoutError(f"HX711: {self.serial.port} still sends gain code {gain_code} "
+                                                f"instead of {self.GAIN}, is the sketch running?")
+                    # The board missed the command, e.g. while it was
+                    # resetting after the port opened; ask once more.
+                    self._send_gain()
+                    resent = True
+                    deadline = time.monotonic() + self.ready_timeout
+        signedIntValue = self.convertFromTwosComplement24bit(value)
+        self.lastVal = signedIntValue
+        self.lastChannel = 'B' if gain_code == 2 else 'A'
+        for sample_filter in self._filters:
+            sample_filter.add(signedIntValue)
+        return signedIntValue
+
+    def set_gain(self, gain):
+        if gain not in GAIN_CODES:
+            raise ValueError(f"SerialHX711: unsupported gain {gain}")
+        with self.readLock:
+            self.GAIN = GAIN_CODES[gain]
+            self._send_gain()
+            # The first frame at the new gain is the conversion the board
+            # clocked while switching; discard it like HX711.set_gain().
+            self._read_conversion()
+            self._ring.restart()
+            for sample_filter in self._filters:
+                sample_filter.reset()
+
+    def _send_gain(self):
+        self.serial.write(b'g' + bytes([self.GAIN]))
+        self.serial.flush()
+
+    def interleave_channels(self, a=1, b=1, discard=0):
+        raise HX711UnsupportedError("SerialHX711 reads one channel at a time; use get_value_B() or set_gain()")
+
+    def readRawBytes(self):
+        raise HX711UnsupportedError("SerialHX711 receives decoded values; use read_long()")
+
+    def power_down(self):
+        with self.readLock:
+            self.serial.write(b'd')
+            self.serial.flush()
+
+    def power_up(self):
+        with self.readLock:
+            self.serial.write(b'u')
+            self.serial.flush()
+            self._buffer.clear()
+            self._seq = None
+        logger.debug("SerialHX711: powered up")
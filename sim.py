@@ -0,0 +1,338 @@
+#!/usr/bin/python3
+"""Simulation layer for running the checkout loop without hardware.
+
+Stands in for everything main.py needs from the Jetson:
+  * the HX711 on a fake gpiod chip (fake_gpiod.py), fed by a synthetic
+    weight timeline or by a recording made with recorder.py,
+  * the Edge Impulse runner, answering from the same timeline or replaying
+    recorded classifier results,
+  * the camera, rendering a frame that changes when the scene does,
+  * the detections API (stub_server.py).
+
+    import sim
+    sim.install()                 # before importing main or hx711
+    scenario = sim.Scenario.synthetic(count=10)
+    sim.attach_scale(scenario)
+"""
+import hashlib
+import json
+import random
+import sys
+import time
+import types
+from collections import namedtuple
+
+import numpy as np
+
+import fake_gpiod
+
+# Jetson Nano line offsets for main.py's pins 38 (DOUT) and 40 (PD_SCK).
+DOUT_LINE = 77
+SCK_LINE = 78
+TARE_RAW = -300_000  # a typical zero-load reading
+REFERENCE_UNIT = 186.0897222218
+
+DEFAULT_PRODUCTS = {
+    # label: (mean weight g, standard deviation g)
+    'Apple': (180.0, 25.0),
+    'Monaco': (100.0, 3.0),
+    'Lays': (52.0, 2.0),
+}
+
+ScenarioItem = namedtuple('ScenarioItem', ['label', 'weight_g', 'placed_at', 'removed_at'])
+
+
+class Scenario:
+    """A timeline of items placed on and taken off the scale.
+
+    Times are seconds since start(). Placing an item ramps the load in over
+    `place_time` seconds with some bounce, like a hand setting it down.
+    """
+
+    def __init__(self, items, place_time=0.3, tail=3.0):
+        self.items = sorted(items, key=lambda item: item.placed_at)
+        self.place_time = place_time
+        self.tail = tail
+        self.start_time = None
+
+    @classmethod
+    def synthetic(cls, count=10, products=None, dwell=2.5, gap=1.5, lead_in=4.0, seed=0):
+        products = products or DEFAULT_PRODUCTS
+        rng = random.Random(seed)
+        labels = sorted(products)
+        items = []
+        t = lead_in
+        for _ in range(count):
+            label = rng.choice(labels)
+            mean, std = products[label]
+            items.append(ScenarioItem(label, round(max(5.0, rng.gauss(mean, std)), 1), t, t + dwell))
+            t += dwell + gap
+        return cls(items)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls([ScenarioItem(**item) for item in data['items']], data.get('place_time', 0.3))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'place_time': self.place_time,
+                       'items': [item._asdict() for item in self.items]}, f, indent=2)
+
+    @property
+    def duration(self):
+        end = max((item.removed_at for item in self.items), default=0.0)
+        return end + self.tail
+
+    def start(self):
+        self.start_time = time.monotonic()
+
+    def elapsed(self):
+        if self.start_time is None:
+            return -1.0
+        return time.monotonic() - self.start_time
+
+    def on_scale(self, t):
+        return [item for item in self.items if item.placed_at <= t < item.removed_at]
+
+    def weight_at(self, t):
+        weight = 0.0
+        for item in self.on_scale(t):
+            since = t - item.placed_at
+            if since < self.place_time:
+                # Ramp in with a damped bounce.
+                ramp = since / self.place_time
+                weight += item.weight_g * (ramp + 0.3 * np.sin(ramp * np.pi * 3) * (1 - ramp))
+            else:
+                weight += item.weight_g
+        return weight
+
+
+class SyntheticScale:
+    """Raw HX711 values for a scenario, for fake_gpiod.FakeHX711Device."""
+
+    def __init__(self, scenario, tare_raw=TARE_RAW, reference_unit=REFERENCE_UNIT,
+                 noise_g=0.2, drift_g_per_s=0.0, seed=0):
+        self.scenario = scenario
+        self.tare_raw = tare_raw
+        self.reference_unit = reference_unit
+        self.noise_g = noise_g
+        # Zero drift, e.g. from the cell warming up, counted from start().
+        self.drift_g_per_s = drift_g_per_s
+        self.rng = random.Random(seed)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.scenario.elapsed()
+        weight = self.scenario.weight_at(t) + self.rng.gauss(0, self.noise_g)
+        weight += self.drift_g_per_s * max(0.0, t)
+        return int(self.tare_raw + weight * self.reference_unit)
+
+
+def replay_recording(path, loop=True):
+    """Raw values from a recorder.py file, oldest first."""
+    from recorder import RecordingReader
+    raws = [int(raw) for raw in RecordingReader(path).ordered()['raw']]
+    if not raws:
+        raise ValueError(f"{path} has no samples")
+    while True:
+        yield from raws
+        if not loop:
+            return
+
+
+def attach_scale(samples, sps=80, chip_name="0"):
+    """Put a fake HX711 on main.py's pins of the shared fake chip."""
+    if isinstance(samples, Scenario):
+        samples = SyntheticScale(samples)
+    chip = fake_gpiod.Chip(chip_name)
+    return chip.attach_hx711(fake_gpiod.FakeHX711Device(samples, sps=sps), DOUT_LINE, SCK_LINE)
+
+
+def _shade(label):
+    return int(hashlib.md5(label.encode()).hexdigest()[:2], 16)
+
+
+def render_frame(labels=(), size=(96, 96), noise=2, rng=None):
+    """RGB frame of the scale plate with `labels` on it (at most one drawn).
+
+    Each product is a square of its own grey level, which
+    FakeImageImpulseRunner can read back when it is given frames instead
+    of a scenario.
+    """
+    width, height = size
+    frame = np.full((height, width, 3), 40, np.int16)
+    for label in labels:
+        frame[height // 4:3 * height // 4, width // 4:3 * width // 4] = _shade(label)
+    if noise:
+        rng = rng or np.random.default_rng()
+        frame += rng.integers(-noise, noise + 1, frame.shape, dtype=np.int16)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+class FakeCameraCapture:
+    """Same interface as camera.CameraCapture, drawing the scenario."""
+
+    def __init__(self, scenario, fps=30, size=(96, 96), noise=2, seed=0):
+        self.scenario = scenario
+        self.period = 1.0 / fps
+        self.size = size
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.delivered = 0
+        self._next_frame = 0.0
+
+    def start(self):
+        self._next_frame = time.monotonic()
+        return self
+
+    def stop(self):
+        pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def read(self, timeout=2.0):
+        now = time.monotonic()
+        if now < self._next_frame:
+            time.sleep(self._next_frame - now)
+            now = self._next_frame
+        self._next_frame = max(now, self._next_frame) + self.period
+        labels = [item.label for item in self.scenario.on_scale(self.scenario.elapsed())]
+        self.delivered += 1
+        return now, render_frame(labels, self.size, self.noise, self.rng)
+
+
+class FakeImageImpulseRunner:
+    """Stand-in for edge_impulse_linux.image.ImageImpulseRunner.
+
+    With a scenario it reports one bounding box per item on the scale;
+    with `results` it replays recorded classifier responses in order; with
+    neither it reads the product off the frame it is given, as drawn by
+    render_frame(). model_type 'classification' reports a score per label
+    instead of bounding boxes.
+    """
+
+    def __init__(self, modelfile=None, scenario=None, results=None, labels=None,
+                 input_size=(96, 96), latency=0.03, confidence=0.9, confusion=0.0, init_time=0.0,
+                 seed=0, model_type='object_detection'):
+        self.modelfile = modelfile
+        self.scenario = scenario
+        self.results = iter(results) if results is not None else None
+        self.labels = labels or sorted(DEFAULT_PRODUCTS)
+        self.input_size = input_size
+        self.latency = latency
+        self.confidence = confidence
+        # Fraction of boxes given a wrong label, for ambiguous products.
+        self.confusion = confusion
+        self.init_time = init_time
+        self.model_type = model_type
+        self._shades = {label: _shade(label) for label in self.labels}
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def init(self):
+        if self.init_time:
+            time.sleep(self.init_time)
+        width, height = self.input_size
+        return {
+            'project': {'name': 'simulated', 'owner': 'sim', 'id': 0},
+            'model_parameters': {
+                'labels': self.labels,
+                'label_count': len(self.labels),
+                'image_input_width': width,
+                'image_input_height': height,
+                'image_channel_count': 3,
+                'model_type': self.model_type,
+            },
+        }
+
+    def stop(self):
+        pass
+
+    def get_features_from_image(self, img):
+        return img, img
+
+    def classify(self, features):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.results is not None:
+            try:
+                return next(self.results)
+            except StopIteration:
+                return {'result': {'bounding_boxes': []}}
+        if self.scenario is not None:
+            on_scale = [item.label for item in self.scenario.on_scale(self.scenario.elapsed())]
+        else:
+            on_scale = self._read_frame(features)
+        timing = {'classification': int(self.latency * 1000)}
+        if self.model_type == 'classification':
+            scores = {label: 0.0 for label in self.labels}
+            for label in on_scale[:1]:
+                scores[self._confuse(label)] = min(1.0, self.confidence + self.rng.uniform(-0.15, 0.05))
+            return {'result': {'classification': scores}, 'timing': timing}
+        width, height = self.input_size
+        boxes = []
+        for label in on_scale:
+            jitter = self.rng.randint(-2, 2)
+            label = self._confuse(label)
+            boxes.append({'label': label,
+                          'value': min(1.0, self.confidence + self.rng.uniform(-0.15, 0.05)),
+                          'x': width // 4 + jitter, 'y': height // 4 + jitter,
+                          'width': width // 2, 'height': height // 2})
+        return {'result': {'bounding_boxes': boxes}, 'timing': timing}
+
+    def _confuse(self, label):
+        if self.confusion and self.rng.random() < self.confusion:
+            return self.rng.choice([other for other in self.labels if other != label] or [label])
+        return label
+
+    def _read_frame(self, img):
+        # The label whose shade the centre of the frame is closest to, unless
+        # the plate's own shade is closer.
+        img = np.asarray(img)
+        if img.ndim < 2 or img.size == 0:
+            return []
+        height, width = img.shape[:2]
+        centre = float(img[height // 3:2 * height // 3, width // 3:2 * width // 3].mean())
+        plate = float(img[:max(1, height // 8)].mean())
+        label = min(self._shades, key=lambda label: abs(self._shades[label] - centre))
+        if abs(plate - centre) <= abs(self._shades[label] - centre):
+            return []
+        return [label]
+
+    def classifier(self, videoDeviceId=0):
+        camera = FakeCameraCapture(self.scenario) if self.scenario else None
+        while True:
+            img = camera.read()[1] if camera else np.zeros((self.input_size[1], self.input_size[0], 3), np.uint8)
+            yield self.classify(img), img
+
+
+def load_results(path):
+    """Classifier responses recorded one JSON object per line."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def install():
+    """Swap gpiod and edge_impulse_linux for the simulated versions."""
+    fake_gpiod.install()
+    package = types.ModuleType('edge_impulse_linux')
+    image = types.ModuleType('edge_impulse_linux.image')
+    image.ImageImpulseRunner = FakeImageImpulseRunner
+    package.image = image
+    sys.modules['edge_impulse_linux'] = package
+    sys.modules['edge_impulse_linux.image'] = image
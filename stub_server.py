@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+"""Local stand-in for the detections API (SERVER_URL).
+
+Accepts the same POSTs as the real server, single objects or arrays,
+records every detection by idempotency key, and can be told to be slow or
+to fail so outage handling can be exercised without the network.
+
+    python stub_server.py [--port 8000]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.down or random.random() < stub.fail_rate:
+            self._reply(503, {'error': 'unavailable'})
+            return
+        try:
+            data = json.loads(body)
+        except ValueError:
+            self._reply(400, {'error': 'invalid json'})
+            return
+        items = data if isinstance(data, list) else [data]
+        if stub.max_items and len(items) > stub.max_items:
+            self._reply(413, {'error': 'too many detections'})
+            return
+        keys = self.headers.get('Idempotency-Key', '')
+        stub.record(items, keys.split(',') if keys else [])
+        self._reply(200, {'received': len(items)})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, max_items=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_items = max_items  # larger posts get 413
+        self.down = False
+        self.requests = 0
+        self.received = {}
+        self.received_at = {}
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/detections"
+
+    def record(self, items, keys=()):
+        # keys: the Idempotency-Key header's keys, one per item.
+        with self._lock:
+            self.requests += 1
+            for i, item in enumerate(items):
+                key = keys[i] if i < len(keys) else f"anonymous-{len(self.received)}"
+                if key in self.received:
+                    self.duplicates += 1
+                else:
+                    self.received[key] = item
+                    self.received_at[key] = time.monotonic()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, args.latency, args.fail_rate)
+    print(f"Serving {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"\n{len(server.received)} detections, {server.duplicates} duplicates, {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
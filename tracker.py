@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""IoU tracker for classifier bounding boxes.
+
+Boxes from consecutive frames are matched to tracks by intersection over
+union. A track is confirmed after `min_hits` matched frames and is reported
+exactly once, so one physical item gives one weigh/price event however long
+it stays in view and however much its label flickers. Tracks that go
+unmatched for `max_misses` frames are dropped.
+"""
+import itertools
+import time
+from collections import defaultdict
+
+
+def iou(a, b):
+    # Boxes are (x, y, width, height).
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class Track:
+    def __init__(self, track_id, box, label, score, now):
+        self.id = track_id
+        self.box = box
+        self.hits = 1
+        self.misses = 0
+        self.reported = False
+        self.first_seen = now
+        self.last_seen = now
+        self.best_score = score
+        self._votes = defaultdict(float)
+        self._votes[label] += score
+
+    def update(self, box, label, score, now):
+        self.box = box
+        self.hits += 1
+        self.misses = 0
+        self.last_seen = now
+        self.best_score = max(self.best_score, score)
+        self._votes[label] += score
+
+    @property
+    def label(self):
+        # Label with the highest summed confidence over the track's life.
+        return max(self._votes.items(), key=lambda item: item[1])[0]
+
+    @property
+    def confidence(self):
+        return self._votes[self.label] / self.hits
+
+
+class IoUTracker:
+    def __init__(self, iou_threshold=0.3, min_hits=3, max_misses=5, min_confidence=0.5):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.min_confidence = min_confidence
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, now=None):
+        # Feed one frame of Edge Impulse bounding boxes; returns the tracks
+        # confirmed by this frame.
+        now = time.monotonic() if now is None else now
+        detections = [((b['x'], b['y'], b['width'], b['height']), b['label'], b['value'])
+                      for b in boxes if b['value'] >= self.min_confidence]
+
+        pairs = []
+        for t, track in enumerate(self.tracks):
+            for d, (box, _, _) in enumerate(detections):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, t, d))
+        pairs.sort(reverse=True)
+        matched_tracks = set()
+        matched_detections = set()
+        for overlap, t, d in pairs:
+            if t in matched_tracks or d in matched_detections:
+                continue
+            matched_tracks.add(t)
+            matched_detections.add(d)
+            box, label, score = detections[d]
+            self.tracks[t].update(box, label, score, now)
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        for d, (box, label, score) in enumerate(detections):
+            if d not in matched_detections:
+                self.tracks.append(Track(next(self._ids), box, label, score, now))
+
+        confirmed = []
+        for track in self.tracks:
+            if not track.reported and track.hits >= self.min_hits:
+                track.reported = True
+                confirmed.append(track)
+        return confirmed
+
+    def reset(self):
+        self.tracks = []